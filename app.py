@@ -1,18 +1,23 @@
+import os
 import streamlit as st
 import pandas as pd
-import folium
-from streamlit_folium import st_folium
 from datetime import datetime
 import numpy as np
-import requests
 
-from utils.data_processing import load_and_process_data
-from utils.predictions import calculate_risk_score, get_risk_level
-from utils.cost_analysis import calculate_cost_impact
-from utils.map_utils import create_equipment_map
-from utils.chatbot import get_chatbot_response
+from utils.data_processing import (
+    OUTAGE_REASONS, TABLE_SORT_COLUMNS, load_equipment_registry, compact_dtypes, decode_outage_reasons,
+    filter_equipment, page_positions, sort_order
+)
+from utils.cost_analysis import calculate_cost_impact, calculate_cost_impacts, cost_grid_cells, summarize_costs
+from utils.chatbot import ChatExecutor, ResponseCache, normalize_query
 from data.sample_data import generate_sample_data
-from utils.weather_utils import fetch_noaa_weather
+from utils.weather_utils import NOAA_API_URL, WeatherCache, WeatherRefresher, calculate_cell_weather_risk, get_weather_cells
+from utils.fleet_store import FleetStore, file_fingerprint
+from utils.scenarios import DEFAULT_SCENARIOS, ScenarioEngine
+from utils.risk_history import RiskHistory
+from utils.dispatch import DispatchPlanner
+from utils.alerts import ALERT_COLUMNS, AlertDetector
+from utils import tracing
 
 # Page config must be the first Streamlit command
 st.set_page_config(
@@ -124,40 +129,136 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Initialize session state
-if 'data' not in st.session_state:
-    st.session_state.data = generate_sample_data()
+@st.cache_resource
+def get_fleet_store():
+    """Fleet dataset shared by every session of this server process"""
+    registry_path = os.environ.get("POWERAI_REGISTRY_PATH")
+    if registry_path:
+        return FleetStore(
+            lambda: load_equipment_registry(registry_path)[0],
+            fingerprint=lambda: file_fingerprint(registry_path)
+        )
+    return FleetStore(lambda: compact_dtypes(generate_sample_data()))
+
+@st.cache_resource
+def get_weather_cache():
+    """Weather readings shared by every session, persisted between restarts"""
+    return WeatherCache(
+        ttl=1800, stale_ttl=6 * 3600,
+        cache_dir=os.environ.get("POWERAI_WEATHER_CACHE_DIR", ".cache/weather")
+    )
+
+@st.cache_resource
+def get_weather_refresher():
+    """Background NOAA refresh shared by every session, reruns never wait on it"""
+    return WeatherRefresher(get_weather_cache(), base_url=os.environ.get("POWERAI_NOAA_API_URL", NOAA_API_URL))
+
+@st.fragment(run_every=5)
+def watch_weather_refresh(seen_version):
+    """Rerun the page once background weather refreshes have landed"""
+    if get_weather_refresher().version != seen_version:
+        st.rerun()
+
+@st.cache_resource
+def get_response_cache():
+    """Chatbot answers shared by every session, persisted between restarts"""
+    return ResponseCache(ttl=3600, cache_dir=os.environ.get("POWERAI_CHAT_CACHE_DIR", ".cache/chat"))
+
+@st.cache_resource
+def get_chat_executor():
+    """Bounded, coalescing chatbot worker pool shared by every session"""
+    return ChatExecutor(max_workers=4, cache=get_response_cache())
+
+@st.cache_resource
+def get_risk_history():
+    """On-disk risk score history, one snapshot per scoring cycle"""
+    return RiskHistory(os.environ.get("POWERAI_RISK_HISTORY_DIR", ".cache/risk_history"))
+
+def format_weather_age(age):
+    if age is None:
+        return "Loading latest forecast..."
+    if age < 60:
+        return "Updated just now"
+    return f"Updated {int(age // 60)} min ago"
+
+# Initialize session state, which only holds per-operator filters and selections
 if 'selected_equipment' not in st.session_state:
     st.session_state.selected_equipment = None
 if 'technicians_deployed' not in st.session_state:
     st.session_state.technicians_deployed = 25
 if 'crews_deployed' not in st.session_state:
     st.session_state.crews_deployed = 3
-if 'weather_data' not in st.session_state:
-    st.session_state.weather_data = fetch_noaa_weather(37.7749, -122.4194)
-
-# Update weather every 30 minutes
-if 'last_weather_update' not in st.session_state:
-    st.session_state.last_weather_update = datetime.now()
-elif (datetime.now() - st.session_state.last_weather_update).total_seconds() > 1800:
-    st.session_state.weather_data = fetch_noaa_weather(37.7749, -122.4194)
-    st.session_state.last_weather_update = datetime.now()
+if 'chat_query' not in st.session_state:
+    st.session_state.chat_query = None
+    st.session_state.chat_response = None
+    st.session_state.chat_error = None
+
+# Opt-in timing of this script run, shown with ?debug=1 and logged as JSON
+# with POWERAI_TRACE_LOG=1
+show_debug_panel = st.query_params.get("debug") == "1"
+if tracing.LOG_TRACES:
+    tracing.configure_logging()
+rerun_trace = tracing.start_trace("rerun", enabled=show_debug_panel)
+
+# Shared fleet snapshot and per-asset weather, with one NOAA lookup per grid
+# cell shared by all sessions through a TTL cache. Cached readings are used
+# as they are, missing or stale cells are refreshed in the background
+with tracing.span("fleet") as stage:
+    fleet = get_fleet_store().get()
+    stage.set(rows=len(fleet.data), version=fleet.version)
+with tracing.span("weather") as stage:
+    weather_cells = fleet.derived('weather_cells', lambda snapshot: get_weather_cells(
+        snapshot.data['latitude'], snapshot.data['longitude']
+    ))
+    center_lats, center_lons, asset_cells = weather_cells
+    weather_refresher = get_weather_refresher()
+    weather_version = weather_refresher.version
+    cell_weather, cell_weather_ages = weather_refresher.get_readings(center_lats, center_lons)
+    weather_risk = calculate_cell_weather_risk(cell_weather)[asset_cells]
+    # Cells without a fetched reading yet are scored on default weather
+    cell_ready = np.array([age is not None for age in cell_weather_ages], dtype=bool)
+    asset_ready = cell_ready[asset_cells]
+    weather_ready = bool(cell_ready.all())
+    stage.set(cells=len(center_lats))
+
+# Headline conditions come from the cell with the most equipment
+headline_cell = np.bincount(asset_cells).argmax()
+weather_data = cell_weather[headline_cell]
+
+# Scored once per weather refresh across all sessions
+with tracing.span("scoring"):
+    data = fleet.scored(weather_risk=weather_risk)
+
+# Every new scoring cycle is appended to the risk history once. Assets in cells
+# still on default weather are recorded as missing, so one unreachable cell
+# does not stop the history. A skipped record is not remembered, so a later
+# rerun tries again
+with tracing.span("risk_history"):
+    risk_series = fleet.derived('risk_series', lambda snapshot: get_risk_history().get_series(
+        snapshot.data['product_id'].astype(str)
+    ))
+    if cell_ready.any():
+        fleet.scored_derived(
+            'risk_history_recorded',
+            lambda scored: risk_series.record(np.where(asset_ready, scored['risk_score'].to_numpy(), np.nan)),
+            weather_risk=weather_risk, cache_if=bool
+        )
 
 # Top metrics row
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    total_equipment = len(st.session_state.data)
+    total_equipment = len(data)
     st.metric("Total Equipment", f"{total_equipment:,}")
 
 with col2:
     st.metric("Network Resilience", "70.0%")
 
 with col3:
-    avg_age = st.session_state.data['age'].mean()
+    avg_age = data['age'].mean()
     st.metric("Average Equipment Age", f"{avg_age:.1f} years")
 
 with col4:
-    total_customers = st.session_state.data['customer_impact'].sum()
+    total_customers = data['customer_impact'].sum()
     st.metric("Total Customer Coverage", f"{total_customers:,}")
 
 # Add maintenance crews row
@@ -168,8 +269,141 @@ with crew1:
 with crew2:
     st.metric("Crews Deployed", str(st.session_state.crews_deployed))
 with weather:
-    weather_text = f"{st.session_state.weather_data['forecast']} ({st.session_state.weather_data['temperature']} {st.session_state.weather_data['temperature_unit']})"
+    weather_text = f"{weather_data['forecast']} ({weather_data['temperature']} {weather_data['temperature_unit']})"
     st.metric("Weather conditions", weather_text)
+    st.caption(format_weather_age(cell_weather_ages[headline_cell]))
+    if not weather_ready:
+        st.caption(
+            f"⚠️ {int((~cell_ready).sum()):,} of {len(cell_ready):,} weather cells have no NOAA reading yet. "
+            f"Their {int((~asset_ready).sum()):,} assets use default weather and are left out of alerts and risk history"
+        )
+
+# Assets whose risk level changed in the latest scoring cycles, detected once
+# per cycle against the previous scores instead of diffing the fleet per rerun
+with tracing.span("alerts"):
+    alert_detector = fleet.derived('alert_detector', lambda snapshot: AlertDetector(snapshot.data['product_id']))
+    # Only assets whose cell has real weather are compared, each taking its
+    # baseline from its first such cycle
+    if cell_ready.any():
+        latest_alerts = fleet.scored_derived(
+            'alerts',
+            lambda scored: alert_detector.update(scored['risk_score'].to_numpy(), scored=asset_ready),
+            weather_risk=weather_risk
+        )
+    else:
+        latest_alerts = pd.DataFrame(columns=ALERT_COLUMNS)
+    alert_feed = alert_detector.feed(limit=200)
+escalations = int((latest_alerts['level'] > latest_alerts['previous_level']).sum())
+with st.expander(f"🚨 Risk alerts ({escalations:,} escalated in the latest update)"):
+    if alert_feed.empty:
+        st.caption("No asset has changed risk level since the dashboard started")
+    else:
+        st.dataframe(
+            pd.DataFrame({
+                'Time': pd.to_datetime(alert_feed['timestamp'], unit='s').dt.strftime('%Y-%m-%d %H:%M'),
+                'ID': alert_feed['product_id'],
+                'From': alert_feed['previous_level'],
+                'To': alert_feed['level'],
+                'Risk Score': alert_feed['risk_score'].round(3),
+            }),
+            hide_index=True,
+            use_container_width=True
+        )
+st.markdown("---")
+watch_weather_refresh(weather_version)
+
+# Portfolio cost exposure. Costs only depend on the fleet, the rollups also on
+# risk scores, so both are computed once per dataset version and reading
+costs = fleet.derived('costs', lambda snapshot: calculate_cost_impacts(snapshot.data))
+def summarize_fleet_costs(scored):
+    cells = cost_grid_cells(scored)
+    return {
+        'total': summarize_costs(scored, costs),
+        'Product type': summarize_costs(scored, costs, 'product_name'),
+        'Risk level': summarize_costs(scored, costs, 'risk_level'),
+        'Grid cell': summarize_costs(scored, costs, [cells['cell_lat'], cells['cell_lon']]),
+    }
+
+with tracing.span("cost_rollups"):
+    cost_rollups = fleet.scored_derived('cost_rollups', summarize_fleet_costs, weather_risk=weather_risk)
+
+cost1, cost2, cost3, cost4 = st.columns(4)
+with cost1:
+    st.metric("Preventative Cost", f"${cost_rollups['total']['preventative_cost']:,.0f}")
+with cost2:
+    st.metric("Repair Exposure", f"${cost_rollups['total']['repair_cost']:,.0f}")
+with cost3:
+    st.metric("Expected Repair Cost", f"${cost_rollups['total']['expected_repair_cost']:,.0f}",
+              help="Repair cost of every asset weighted by its risk score")
+with cost4:
+    st.metric("Potential Savings", f"${cost_rollups['total']['savings']:,.0f}")
+with st.expander("💰 Cost breakdown"):
+    rollup_by = st.radio("Group by", ["Product type", "Risk level", "Grid cell"], horizontal=True, key="cost_rollup_by")
+    st.dataframe(cost_rollups[rollup_by], use_container_width=True)
+with st.expander("🌩️ Storm preparation scenarios"):
+    # Every scenario is scored against the whole fleet once per dataset version
+    with tracing.span("scenarios"):
+        scenario_engine = fleet.derived('scenario_engine', lambda snapshot: ScenarioEngine(snapshot.data))
+        scenario_summary = fleet.derived(
+            'scenario_summary', lambda snapshot: scenario_engine.evaluate(DEFAULT_SCENARIOS, k=3)
+        )
+    product_ids = fleet.data['product_id']
+    st.dataframe(
+        pd.DataFrame({
+            'Scenario': scenario_summary['scenario'],
+            'Mean risk': scenario_summary['mean_risk'].round(3),
+            'Assets at risk': scenario_summary['at_risk_assets'],
+            'Customers at risk': scenario_summary['at_risk_customers'],
+            'Riskiest assets': [
+                ", ".join(product_ids.iloc[positions].astype(str)) for positions in scenario_summary['top_positions']
+            ],
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
+    st.caption("Assets at risk score High or Critical under the scenario's forecast")
+with st.expander("🚚 Crew dispatch plan"):
+    # The planner keeps its ranking between scoring cycles and only re-ranks
+    # the assets whose risk score changed
+    with tracing.span("dispatch"):
+        dispatch_planner = fleet.derived(
+            'dispatch_planner', lambda snapshot: DispatchPlanner(snapshot.data, costs=costs)
+        )
+        fleet.scored_derived(
+            'dispatch_risk', lambda scored: dispatch_planner.set_risk(scored['risk_score'].to_numpy()),
+            weather_risk=weather_risk
+        )
+        crews, technicians = st.session_state.crews_deployed, st.session_state.technicians_deployed
+        dispatch_plan = fleet.scored_derived(
+            ('dispatch_plan', crews, technicians), lambda scored: dispatch_planner.plan(crews, technicians),
+            weather_risk=weather_risk
+        )
+    plan1, plan2, plan3 = st.columns(3)
+    with plan1:
+        st.metric("Assets Scheduled", f"{len(dispatch_plan):,}")
+    with plan2:
+        st.metric("Expected Avoided Cost", f"${dispatch_plan['expected_avoided_cost'].sum():,.0f}")
+    with plan3:
+        crew_hours = dispatch_plan['job_hours'].sum() + dispatch_plan['travel_hours'].sum()
+        st.metric("Crew-Hours Used", f"{crew_hours:,.1f}")
+    st.dataframe(
+        pd.DataFrame({
+            'Crew': dispatch_plan['crew'],
+            'Stop': dispatch_plan['stop'],
+            'ID': dispatch_plan['product_id'],
+            'Type': data['product_name'].iloc[dispatch_plan['position']].to_numpy(),
+            'Risk Score': dispatch_plan['risk_score'].round(3),
+            'Avoided Cost': dispatch_plan['expected_avoided_cost'].round(0),
+            'Work (h)': dispatch_plan['job_hours'],
+            'Travel (h)': dispatch_plan['travel_hours'].round(2),
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
+    st.caption(
+        f"One shift for {st.session_state.crews_deployed} crews and {st.session_state.technicians_deployed} "
+        "technicians, highest expected avoided repair cost per crew-hour first"
+    )
 st.markdown("---")
 
 # Main layout
@@ -180,44 +414,138 @@ with left_col:
     # Search functionality for table
     search = st.text_input("🔍 Search Equipment", placeholder="Enter ID or name to filter the table...")
 
-    # Filter data based on search
-    filtered_data = st.session_state.data.copy() #create a copy to avoid modifying original data
-    if search:
-        filtered_data = filtered_data[
-            filtered_data['product_name'].str.contains(search, case=False) |
-            filtered_data['product_id'].str.contains(search, case=False)
-        ]
-
-    # Update risk calculations in the data processing
-    for idx, row in filtered_data.iterrows():
-        filtered_data.at[idx, 'risk_score'] = calculate_risk_score(row, st.session_state.weather_data)
-
-
-    # Display data table
-    st.dataframe(
-        filtered_data,
-        height=600,
-        use_container_width=True
+    product_names = st.multiselect(
+        "Equipment type",
+        options=list(data['product_name'].cat.categories),
+        placeholder="All equipment types"
     )
+    outage_reasons = st.multiselect(
+        "Possible outage reasons",
+        options=OUTAGE_REASONS,
+        placeholder="Any outage reasons, selected ones must all apply"
+    )
+
+    # Filter data based on search, as row positions so nothing is copied
+    with tracing.span("table_filter") as stage:
+        positions = filter_equipment(
+            data,
+            positions=fleet.search_index.search(search),
+            product_names=product_names,
+            outage_reasons=outage_reasons
+        )
+        stage.set(result_rows=len(data) if positions is None else len(positions))
+
+    # Sort order and page size are widget state, so they persist per session
+    sort_col, direction_col, size_col = st.columns([2, 1, 1])
+    with sort_col:
+        sort_column = st.selectbox(
+            "Sort by", options=list(TABLE_SORT_COLUMNS),
+            format_func=TABLE_SORT_COLUMNS.get, key="table_sort"
+        )
+    with direction_col:
+        descending = st.selectbox(
+            "Order", options=[True, False],
+            format_func=lambda value: "Highest first" if value else "Lowest first",
+            key="table_descending"
+        )
+    with size_col:
+        page_size = st.selectbox("Rows per page", options=[25, 50, 100, 250], index=1, key="table_page_size")
+
+    # Fleet-wide sort orders are computed once, risk order once per weather reading
+    if sort_column == 'risk_score':
+        order = fleet.scored_derived(
+            ('sort_order', sort_column), lambda scored: sort_order(scored['risk_score']), weather_risk=weather_risk
+        )
+    else:
+        order = fleet.derived(('sort_order', sort_column), lambda snapshot: sort_order(snapshot.data[sort_column]))
+
+    total_rows = len(data) if positions is None else len(positions)
+    page_count = max(-(-total_rows // page_size), 1)
+    if st.session_state.get("table_page", 1) > page_count:
+        st.session_state.table_page = page_count
+
+    # Display data table, only the rows of the current page are sent
+    with tracing.span("table_page") as stage:
+        rows, total_rows = page_positions(
+            order, data[sort_column].to_numpy(), positions,
+            page=st.session_state.get("table_page", 1), page_size=page_size, descending=descending
+        )
+        page_data = data.iloc[rows]
+        stage.set(result_rows=len(page_data))
+    with tracing.span("table_render", rows=len(page_data)):
+        st.dataframe(
+            page_data.drop(columns=['outage_flags']).assign(
+                possible_outage=decode_outage_reasons(page_data['outage_flags'].to_numpy())
+            ),
+            height=600,
+            use_container_width=True
+        )
+
+    page_col, count_col = st.columns([1, 2])
+    with page_col:
+        page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="table_page")
+    with count_col:
+        first_row = min((page - 1) * page_size + 1, total_rows)
+        st.caption(f"Rows {first_row:,}–{min(page * page_size, total_rows):,} of {total_rows:,}")
 
 # Right Panel - Map
 with right_col:
     st.subheader("📍 Equipment Location Map")
 
-    # Create and display the map with click events
-    map_data = create_equipment_map(st.session_state.data)  # Use full dataset for map
-    map_events = st_folium(
-        map_data,
-        height=600,
-        width=None,
-        returned_objects=["last_clicked"]
+    # folium and streamlit_folium load here, after the metrics and table are
+    # already on screen, instead of delaying the first paint of the page
+    from streamlit_folium import st_folium
+    from utils.map_utils import create_equipment_map, map_modes
+
+    # Level of detail only sends what the current view needs and is the default.
+    # GeoJSON and markers send every asset, so they are only offered for fleets
+    # small enough to stay responsive
+    available_modes = map_modes(len(data))
+    if st.session_state.get("map_mode") not in available_modes:
+        st.session_state.pop("map_mode", None)
+    map_mode = st.radio(
+        "Map rendering",
+        options=available_modes,
+        format_func=lambda mode: {
+            "markers": "Markers", "geojson": "Fast (GeoJSON)", "lod": "Level of detail"
+        }[mode],
+        horizontal=True,
+        key="map_mode"
     )
 
-    # Handle map click events
-    if map_events["last_clicked"] and isinstance(map_events["last_clicked"], dict):
-        clicked_content = map_events["last_clicked"].get("popup", "")
-        if "ID:" in clicked_content:
-            equipment_id = clicked_content.split("ID:")[1].split("<br>")[0].strip()
+    # Create and display the map with click events
+    if map_mode == "lod":
+        # Rebuild around the view st_folium reported on the previous run
+        map_view = st.session_state.get("equipment_map") or {}
+        center = map_view.get("center")
+        map_data = create_equipment_map(
+            data,
+            mode=map_mode,
+            center=[center["lat"], center["lng"]] if center else None,
+            zoom=map_view.get("zoom"),
+            bounds=map_view.get("bounds")
+        )
+        returned_objects = ["last_object_clicked", "bounds", "zoom", "center"]
+    else:
+        map_data = create_equipment_map(data, mode=map_mode)  # Use full dataset for map
+        returned_objects = ["last_object_clicked"]
+
+    with tracing.span("st_folium", mode=map_mode):
+        map_events = st_folium(
+            map_data,
+            height=600,
+            width=None,
+            returned_objects=returned_objects,
+            key="equipment_map"
+        )
+
+    # Handle map click events, resolving the clicked marker by its coordinates
+    clicked = map_events.get("last_object_clicked")
+    if isinstance(clicked, dict) and clicked != st.session_state.get("last_map_click"):
+        st.session_state.last_map_click = clicked
+        position = fleet.asset_index.nearest(clicked["lat"], clicked["lng"], max_km=0.5)
+        if position is not None:
+            equipment_id = data['product_id'].iloc[position]
             if equipment_id != st.session_state.selected_equipment:
                 st.session_state.selected_equipment = equipment_id
                 st.rerun()
@@ -226,28 +554,48 @@ with right_col:
 st.markdown("---")
 user_input = st.text_input("🤖 Chatbot", placeholder="Ask me anything about the network...")
 
-# Process chatbot input
-if user_input:
+# Process chatbot input. The text input keeps its value across reruns, so a
+# question, even one that failed, is only submitted, and technicians only
+# added, when it changes
+if user_input and normalize_query(user_input) != st.session_state.chat_query:
     try:
-        # Get AI response
-        response = get_chatbot_response(user_input, st.session_state.data)
-
-        # Display response in a nice format
-        st.info(response["recommendation"])
+        # Stream the AI response as it is generated
+        with tracing.span("chatbot") as stage:
+            stream = get_chat_executor().submit(user_input, data)
+            with st.container(border=True):
+                st.write_stream(stream.iter_text())
+            response = stream.result()
+            stage.set(cached=response["cached"], response_bytes=len(response["recommendation"]))
+        st.session_state.chat_query = normalize_query(user_input)
+        st.session_state.chat_response = response
+        st.session_state.chat_error = None
 
         # Add 10 technicians after receiving the response
         st.session_state.technicians_deployed += 10
+        st.rerun()
 
     except Exception as e:
-        st.error(f"Error: {str(e)}")
+        st.session_state.chat_query = normalize_query(user_input)
+        st.session_state.chat_response = None
+        st.session_state.chat_error = str(e)
         print(f"Chatbot error: {str(e)}")  # Add logging
 
-# Sidebar for equipment details
+# Display response in a nice format
+if user_input and normalize_query(user_input) == st.session_state.chat_query:
+    if st.session_state.chat_error is not None:
+        st.error(f"Error: {st.session_state.chat_error}")
+    elif st.session_state.chat_response is not None:
+        st.info(st.session_state.chat_response["recommendation"])
+
+# Sidebar for equipment details, a fleet reload may have removed the selection
+if (st.session_state.selected_equipment is not None and
+        fleet.asset_index.position(st.session_state.selected_equipment) is None):
+    st.session_state.selected_equipment = None
 if st.session_state.selected_equipment is not None:
     with st.sidebar:
-        equipment = st.session_state.data[
-            st.session_state.data['product_id'] == st.session_state.selected_equipment
-        ].iloc[0]
+        position = fleet.asset_index.position(st.session_state.selected_equipment)
+        equipment = data.iloc[position]
+        local_weather = cell_weather[asset_cells[position]]
 
         st.title(f"📋 Equipment Details")
         st.write(f"**ID:** {equipment['product_id']}")
@@ -255,6 +603,8 @@ if st.session_state.selected_equipment is not None:
         st.write(f"**Installation Date:** {equipment['installation_date'].strftime('%Y-%m-%d')}")
         st.write(f"**Last Maintenance:** {equipment['last_maintenance_date'].strftime('%Y-%m-%d')}")
         st.write(f"**Customer Impact:** {equipment['customer_impact']:,} customers")
+        st.write(f"**Possible Outage:** {decode_outage_reasons(equipment['outage_flags'])}")
+        st.write(f"**Local Weather:** {local_weather['forecast']} ({local_weather['temperature']} {local_weather['temperature_unit']})")
 
         st.subheader("💰 Cost Analysis")
         cost_impact = calculate_cost_impact(equipment)
@@ -270,6 +620,26 @@ if st.session_state.selected_equipment is not None:
                 f"${cost_impact['repair_cost']:,.0f}"
             )
 
+        st.subheader("📈 Risk Trend")
+        history_times, history_risk = risk_series.asset_history(position, max_points=200)
+        if len(history_times) < 2:
+            st.caption("The trend appears once this asset has been scored in more than one cycle")
+        else:
+            import plotly.graph_objects as go
+
+            fleet_times, fleet_risk = risk_series.fleet_history('mean', max_points=200)
+            figure = go.Figure([
+                go.Scatter(x=pd.to_datetime(history_times, unit='s'), y=history_risk,
+                           name="This asset", line=dict(color="#FFDC3C")),
+                go.Scatter(x=pd.to_datetime(fleet_times, unit='s'), y=fleet_risk,
+                           name="Fleet average", line=dict(color="#888888", dash="dot")),
+            ])
+            figure.update_layout(
+                height=250, margin=dict(l=0, r=0, t=10, b=0), yaxis=dict(range=[0, 1], title="Risk score"),
+                legend=dict(orientation="h"), template="plotly_dark"
+            )
+            st.plotly_chart(figure, use_container_width=True)
+
         if st.button("Close Details"):
             st.session_state.selected_equipment = None
             st.rerun()
@@ -280,4 +650,12 @@ st.markdown(
     "<div style='text-align: center; color: #EEEEEE;'>Last updated: "
     f"{datetime.now().strftime('%Y-%m-%d %H:%M')} UTC</div>",
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+# Debug timing panel, filled once every stage of this run has finished
+if tracing.finish_trace(rerun_trace) is not None and show_debug_panel:
+    with st.sidebar.expander("⏱️ Debug timings", expanded=True):
+        st.metric("Script run", f"{rerun_trace.duration * 1000:,.0f} ms")
+        spans = pd.DataFrame([span.to_dict() for span in rerun_trace.spans])
+        spans['name'] = ["\u2003" * depth + name for depth, name in zip(spans['depth'], spans['name'])]
+        st.dataframe(spans.drop(columns=['depth']), hide_index=True, use_container_width=True)
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Measure what importing the dashboard's modules costs at startup
+
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile utils.chatbot openai --top 15 --json
+
+Each target is imported in a fresh interpreter with -X importtime, so nothing
+is already cached, and the cost is reported per module and per top-level package
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Modules the dashboard imports before its first paint
+STARTUP_MODULES = [
+    "streamlit",
+    "pandas",
+    "numpy",
+    "utils.data_processing",
+    "utils.cost_analysis",
+    "utils.chatbot",
+    "utils.weather_utils",
+    "utils.fleet_store",
+    "utils.tracing",
+    "data.sample_data",
+]
+
+def measure_imports(modules):
+    """
+    Import modules in a fresh interpreter and return one record per module
+    loaded, with its own (self_ms) and cumulative (total_ms) import time
+    """
+    code = "".join(f"import {module}\n" for module in modules)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=root, capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed:\n{process.stderr}")
+
+    records = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, total_us, name = line[len("import time:"):].split("|")
+        records.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_ms': int(self_us) / 1000,
+            'total_ms': int(total_us) / 1000,
+        })
+    return records
+
+def summarize_packages(records):
+    """Self time of every top-level package, most expensive first"""
+    packages = {}
+    for record in records:
+        package = record['module'].split('.')[0]
+        packages[package] = packages.get(package, 0) + record['self_ms']
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report import cost per module")
+    parser.add_argument("modules", nargs="*", default=STARTUP_MODULES)
+    parser.add_argument("--top", type=int, default=20, help="rows to print per table")
+    parser.add_argument("--json", action="store_true", help="print the raw records as JSON")
+    args = parser.parse_args(argv)
+
+    records = measure_imports(args.modules)
+    if args.json:
+        print(json.dumps({'modules': args.modules, 'records': records}, indent=2))
+        return
+
+    total = sum(record['self_ms'] for record in records)
+    print(f"Importing {', '.join(args.modules)} took {total:,.0f} ms\n")
+
+    print("Requested modules (cumulative):")
+    requested = {record['module']: record for record in records if record['module'] in args.modules}
+    for module in args.modules:
+        if module in requested:
+            print(f"  {module:<40} {requested[module]['total_ms']:>9.1f} ms")
+        else:
+            print(f"  {module:<40} {'already loaded':>12}")
+
+    print("\nPackages (self time):")
+    for package, self_ms in summarize_packages(records)[:args.top]:
+        print(f"  {package:<40} {self_ms:>9.1f} ms")
+
+    print("\nSlowest modules (self time):")
+    for record in sorted(records, key=lambda record: record['self_ms'], reverse=True)[:args.top]:
+        print(f"  {record['module']:<40} {record['self_ms']:>9.1f} ms")
+
+if __name__ == "__main__":
+    main()
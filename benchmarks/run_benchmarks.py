@@ -0,0 +1,227 @@
+"""
+Benchmarks for the dashboard's hot paths at several fleet sizes
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --sizes 100 10000 --only risk_scores map_lod
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<commit>.json
+
+Results are written as JSON to benchmarks/results/<commit>.json (or --output),
+so runs can be compared across commits with --compare
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from data.sample_data import generate_fleet
+from utils.data_processing import REQUIRED_COLUMNS, compact_dtypes, filter_equipment, load_and_process_data
+from utils.predictions import calculate_risk_score, calculate_risk_scores, get_risk_levels
+from utils.map_utils import GEOJSON_MAX_ASSETS, MARKERS_MAX_ASSETS, create_equipment_map
+from utils.search_index import SearchIndex
+from utils.cost_analysis import calculate_cost_impact, calculate_cost_impacts, summarize_costs
+from utils.chatbot import build_prompt_context, get_chatbot_response
+
+DEFAULT_SIZES = [100, 10_000, 100_000, 1_000_000]
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+WEATHER = {'temperature': 75, 'temperature_unit': 'F', 'wind_speed': '15 mph', 'forecast': 'Rain'}
+
+class FakeCompletions:
+    """Answers every completion instantly, so only the prompt work is measured"""
+
+    def create(self, model, messages, **kwargs):
+        message = SimpleNamespace(content="Inspect the highest risk equipment first. Deploy 3")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+FAKE_CLIENT = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+
+def make_fleet(size, seed=42):
+    """Raw registry rows and the processed, scored fleet of the given size"""
+    raw = generate_fleet(size, seed=seed)[REQUIRED_COLUMNS]
+    data = compact_dtypes(load_and_process_data(raw.copy()))
+    risk_scores = calculate_risk_scores(data)
+    data['risk_score'] = risk_scores.astype(np.float32)
+    data['risk_level'] = get_risk_levels(risk_scores).astype('category')
+    return raw, data
+
+def measure(func, min_time=1.0, max_repeats=5):
+    """
+    Run func until min_time has passed or max_repeats is reached
+    Returns the list of wall-clock timings and the last return value
+    """
+    timings, result = [], None
+    while len(timings) < max_repeats and (sum(timings) < min_time or not timings):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+# Each benchmark takes (raw, data, context) and returns (func, max_size). func
+# is timed; if it returns a dict, the dict is stored as extra metrics.
+# Benchmarks are skipped above max_size, None means every size
+def bench_risk_scores(raw, data, context):
+    return lambda: calculate_risk_scores(data, WEATHER), None
+
+def bench_risk_score_rows(raw, data, context):
+    # The original row-by-row scoring, kept as a baseline for small fleets
+    return lambda: [calculate_risk_score(row, WEATHER) for _, row in data.iterrows()], 10_000
+
+def _map_benchmark(mode, **view):
+    def bench(raw, data, context):
+        def build():
+            html = create_equipment_map(data, mode=mode, **view).get_root().render()
+            return {'html_bytes': len(html.encode())}
+        return build, {'markers': MARKERS_MAX_ASSETS, 'geojson': GEOJSON_MAX_ASSETS}.get(mode)
+    return bench
+
+def bench_search_build(raw, data, context):
+    def build():
+        context['search_index'] = SearchIndex(data)
+    return build, None
+
+def bench_search_filter(raw, data, context):
+    if 'search_index' not in context:
+        context['search_index'] = SearchIndex(data)
+    index = context['search_index']
+
+    def search():
+        matches = {}
+        for query in ["EQ00", "transformer", "EQ0012", "pole"]:
+            positions = filter_equipment(data, positions=index.search(query), product_names=["Transformer", "Power Pole"])
+            matches[query] = int(len(positions))
+        return {'matches': matches}
+    return search, None
+
+def bench_load_and_process(raw, data, context):
+    return lambda: load_and_process_data(raw.copy()), None
+
+def bench_cost_rows(raw, data, context):
+    return lambda: [calculate_cost_impact(row) for _, row in data.iterrows()], 10_000
+
+def bench_cost_batch(raw, data, context):
+    def rollup():
+        costs = calculate_cost_impacts(data)
+        summarize_costs(data, costs, 'product_name')
+        summarize_costs(data, costs, 'risk_level')
+    return rollup, None
+
+def bench_prompt_context(raw, data, context):
+    def build():
+        records, _ = build_prompt_context("Which transformers in the north need work?", data)
+        return {'prompt_bytes': len(json.dumps(records, indent=2))}
+    return build, None
+
+def bench_chatbot_response(raw, data, context):
+    def respond():
+        get_chatbot_response("What needs maintenance first?", data, llm_client=FAKE_CLIENT)
+    return respond, None
+
+BENCHMARKS = {
+    'risk_scores': bench_risk_scores,
+    'risk_score_rows': bench_risk_score_rows,
+    'map_markers': _map_benchmark("markers"),
+    'map_geojson': _map_benchmark("geojson"),
+    'map_lod': _map_benchmark("lod", zoom=12),
+    'search_build': bench_search_build,
+    'search_filter': bench_search_filter,
+    'load_and_process': bench_load_and_process,
+    'cost_rows': bench_cost_rows,
+    'cost_batch': bench_cost_batch,
+    'prompt_context': bench_prompt_context,
+    'chatbot_response': bench_chatbot_response,
+}
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__), text=True,
+            stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_benchmarks(sizes=DEFAULT_SIZES, names=None, min_time=1.0, max_repeats=5):
+    """Run the selected benchmarks at every size, returning the JSON report"""
+    names = names or list(BENCHMARKS)
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': [],
+    }
+    for size in sizes:
+        raw, data = make_fleet(size)
+        context = {}
+        for name in names:
+            func, max_size = BENCHMARKS[name](raw, data, context)
+            entry = {'benchmark': name, 'size': size}
+            if max_size is not None and size > max_size:
+                entry['skipped'] = f"only run up to {max_size:,} assets"
+            else:
+                timings, result = measure(func, min_time, max_repeats)
+                entry.update({
+                    'min_seconds': min(timings),
+                    'median_seconds': statistics.median(timings),
+                    'repeats': len(timings),
+                })
+                if isinstance(result, dict):
+                    entry.update(result)
+            report['results'].append(entry)
+            print(format_entry(entry), flush=True)
+    return report
+
+def format_entry(entry, baseline=None):
+    label = f"{entry['benchmark']:<18} {entry['size']:>10,}"
+    if 'skipped' in entry:
+        return f"{label}  skipped ({entry['skipped']})"
+    line = f"{label}  {entry['min_seconds'] * 1000:>10.2f} ms"
+    if 'html_bytes' in entry:
+        line += f"  {entry['html_bytes'] / 1024:,.0f} KiB html"
+    if baseline and 'min_seconds' in baseline:
+        line += f"  {entry['min_seconds'] / baseline['min_seconds']:.2f}x vs baseline"
+    return line
+
+def compare(report, baseline_path):
+    """Print every result next to the same benchmark and size in a baseline report"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(entry['benchmark'], entry['size']): entry for entry in baseline['results']}
+    print(f"\nCompared with {baseline['commit']} ({baseline['timestamp']}):")
+    for entry in report['results']:
+        print(format_entry(entry, previous.get((entry['benchmark'], entry['size']))))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to spend per benchmark")
+    parser.add_argument("--max-repeats", type=int, default=5)
+    parser.add_argument("--output", help="JSON file to write, default benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.only, args.min_time, args.max_repeats)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    sys.exit(main())
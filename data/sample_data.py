@@ -1,50 +1,139 @@
+import argparse
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
+
+PRODUCT_NAMES = ['Transformer', 'Power Pole', 'Switch Gear', 'Circuit Breaker']
+
+# (south, west, north, east) of the demo territory, the San Francisco area
+DEFAULT_TERRITORY = (37.7, -122.5, 37.9, -122.4)
 
 def generate_sample_data(n_samples=100):
     """Generate sample equipment data for demonstration"""
-    np.random.seed(42)
-    
-    # Generate random dates
-    current_date = datetime.now()
-    
-    # Create sample data
-    data = {
-        'product_id': [f'EQ{i:03d}' for i in range(n_samples)],
-        'product_name': np.random.choice(
-            ['Transformer', 'Power Pole', 'Switch Gear', 'Circuit Breaker'],
-            n_samples
-        ),
-        'latitude': np.random.uniform(37.7, 37.9, n_samples),  # San Francisco area
-        'longitude': np.random.uniform(-122.5, -122.4, n_samples),
-        'installation_date': [
-            current_date - timedelta(days=np.random.randint(365, 3650))
-            for _ in range(n_samples)
-        ],
-        'last_maintenance_date': [
-            current_date - timedelta(days=np.random.randint(0, 365))
-            for _ in range(n_samples)
-        ],
-        'temperature': np.random.uniform(60, 90, n_samples),
-        'precipitation_forecast': np.random.uniform(0, 50, n_samples),
-        'vegetation_proximity': np.random.choice([True, False], n_samples),
-        'customer_impact': np.random.randint(50, 1000, n_samples)
-    }
-    
-    df = pd.DataFrame(data)
-    
-    # Calculate age and days since maintenance
-    df['age'] = (current_date - df['installation_date']).dt.days / 365
-    df['days_since_maintenance'] = (current_date - df['last_maintenance_date']).dt.days
-    
-    # Calculate risk score
-    df['risk_score'] = (
-        df['age'] / 20 * 0.3 +
-        df['days_since_maintenance'] / 365 * 0.25 +
-        (df['temperature'] - 70) ** 2 / 1000 * 0.2 +
-        df['vegetation_proximity'].astype(int) * 0.15 +
-        df['customer_impact'] / 1000 * 0.1
-    ).clip(0, 1)
-    
-    return df
+    return generate_fleet(n_samples, seed=42)
+
+def _cluster_layout(rng, territory, n_clusters):
+    """Centers, spreads and relative sizes of the settlements in a territory"""
+    south, west, north, east = territory
+    centers = np.column_stack([
+        rng.uniform(south, north, n_clusters),
+        rng.uniform(west, east, n_clusters),
+    ])
+    # A few large towns and many small ones
+    sizes = rng.lognormal(0, 1, n_clusters)
+    weights = sizes / sizes.sum()
+    # Fewer settlements cover more ground each
+    spreads = 0.25 * min(north - south, east - west) / np.sqrt(n_clusters) * np.sqrt(sizes)
+    return centers, spreads, weights
+
+def generate_fleet_chunks(n_assets, chunk_size=250_000, seed=42, territory=DEFAULT_TERRITORY,
+                          n_clusters=None, rural_share=0.1, reference_date=None, chunk_indices=None):
+    """
+    Yield a synthetic fleet of n_assets as DataFrames of at most chunk_size rows
+    Equipment is clustered around settlements spread over territory, with
+    rural_share of it scattered uniformly. The same seed and chunk_size always
+    produce the same fleet, and only one chunk is held in memory at a time.
+    chunk_indices limits it to those chunks, so parts of a fleet can be
+    generated separately
+    """
+    south, west, north, east = territory
+    now = np.datetime64(reference_date if reference_date is not None else datetime.now(), 's')
+    id_width = max(3, len(str(max(n_assets - 1, 0))))
+
+    seed_sequence = np.random.SeedSequence(seed)
+    layout_seed, chunk_seed = seed_sequence.spawn(2)
+    n_clusters = n_clusters or int(np.clip(np.sqrt(n_assets) / 10, 5, 500))
+    centers, spreads, weights = _cluster_layout(np.random.default_rng(layout_seed), territory, n_clusters)
+
+    n_chunks = -(-n_assets // chunk_size) if n_assets else 0
+    selected = set(range(n_chunks) if chunk_indices is None else chunk_indices)
+    for chunk, rng_seed in zip(range(n_chunks), chunk_seed.spawn(n_chunks)):
+        if chunk not in selected:
+            continue
+        rng = np.random.default_rng(rng_seed)
+        start = chunk * chunk_size
+        size = min(chunk_size, n_assets - start)
+
+        cluster = rng.choice(n_clusters, size, p=weights)
+        latitude = rng.normal(centers[cluster, 0], spreads[cluster])
+        longitude = rng.normal(centers[cluster, 1], spreads[cluster])
+        # Rural equipment, and anything that fell outside the territory, is
+        # scattered uniformly rather than piled up on its border
+        rural = rng.random(size) < rural_share
+        rural |= (latitude < south) | (latitude > north) | (longitude < west) | (longitude > east)
+        latitude[rural] = rng.uniform(south, north, rural.sum())
+        longitude[rural] = rng.uniform(west, east, rural.sum())
+
+        installed_days = rng.integers(365, 3650, size)
+        maintained_days = rng.integers(0, 365, size)
+        ids = np.char.zfill(np.arange(start, start + size).astype(str), id_width)
+
+        df = pd.DataFrame({
+            'product_id': np.char.add('EQ', ids),
+            'product_name': pd.Categorical.from_codes(rng.integers(0, len(PRODUCT_NAMES), size), PRODUCT_NAMES),
+            'latitude': latitude,
+            'longitude': longitude,
+            'installation_date': now - installed_days.astype('timedelta64[D]'),
+            'last_maintenance_date': now - maintained_days.astype('timedelta64[D]'),
+            'temperature': rng.uniform(60, 90, size),
+            'precipitation_forecast': rng.uniform(0, 50, size),
+            'vegetation_proximity': rng.random(size) < 0.5,
+            'customer_impact': rng.integers(50, 1000, size),
+        })
+
+        # Calculate age and days since maintenance
+        df['age'] = installed_days / 365
+        df['days_since_maintenance'] = maintained_days
+
+        # Calculate risk score
+        df['risk_score'] = (
+            df['age'] / 20 * 0.3 +
+            df['days_since_maintenance'] / 365 * 0.25 +
+            (df['temperature'] - 70) ** 2 / 1000 * 0.2 +
+            df['vegetation_proximity'].astype(int) * 0.15 +
+            df['customer_impact'] / 1000 * 0.1
+        ).clip(0, 1)
+
+        yield df
+
+def generate_fleet(n_assets, **kwargs):
+    """Synthetic fleet as one DataFrame, see generate_fleet_chunks for options"""
+    chunks = list(generate_fleet_chunks(n_assets, **kwargs))
+    if not chunks:
+        return next(generate_fleet_chunks(1, **kwargs)).iloc[:0]
+    return pd.concat(chunks, ignore_index=True)
+
+def write_fleet_parquet(path, n_assets, **kwargs):
+    """
+    Stream a synthetic fleet to a Parquet file one chunk per row group, so
+    fleets larger than memory can be written. Returns the number of rows
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows, writer = 0, None
+    try:
+        for chunk in generate_fleet_chunks(n_assets, **kwargs):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic equipment fleet to Parquet")
+    parser.add_argument("n_assets", type=int)
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=250_000)
+    parser.add_argument("--territory", type=float, nargs=4, default=DEFAULT_TERRITORY,
+                        metavar=("SOUTH", "WEST", "NORTH", "EAST"))
+    args = parser.parse_args()
+
+    rows = write_fleet_parquet(args.path, args.n_assets, seed=args.seed,
+                               chunk_size=args.chunk_size, territory=tuple(args.territory))
+    print(f"Wrote {rows:,} assets to {args.path}")
@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+class NoaaStub(BaseHTTPRequestHandler):
+    """
+    Answers /points/<lat>,<lon> and /forecast/<lat>,<lon> like api.weather.gov
+    The server's state decides the reply: mode "ok", "error" (HTTP 500) or
+    "slow" (sleeps delay seconds first), and the temperature to report
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        state = self.server.state
+        kind, _, location = self.path.strip("/").partition("/")
+        state['requests'][kind] += 1
+        if state['mode'] == "slow":
+            time.sleep(state['delay'])
+        if state['mode'] == "error":
+            self.send_error(500)
+            return
+
+        if kind == "points":
+            body = {'properties': {'forecast': f"{state['url']}/forecast/{location}"}}
+        elif kind == "forecast":
+            body = {'properties': {'periods': [{
+                'temperature': state['temperature'],
+                'temperatureUnit': "F",
+                'shortForecast': state['forecast'],
+                'windSpeed': "10 mph",
+                'windDirection': "W",
+                'isDaytime': True,
+            }]}}
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/geo+json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+@pytest.fixture
+def noaa_server():
+    """A local NOAA API, its state dict holds the url, mode and request counts"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), NoaaStub)
+    server.daemon_threads = True
+    server.state = {
+        'url': f"http://127.0.0.1:{server.server_port}",
+        'mode': "ok",
+        'delay': 1.0,
+        'temperature': 72,
+        'forecast': "Sunny",
+        'requests': Counter(),
+    }
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.state
+    server.shutdown()
+    server.server_close()
+
+class OpenAIStub(BaseHTTPRequestHandler):
+    """
+    Answers /v1/chat/completions with a server-sent event stream of the
+    state's words. Replies wait for the release event, so tests can line up
+    callers behind one request, then stream the words or, with mode "error",
+    fail with HTTP 500
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        state = self.server.state
+        self.rfile.read(int(self.headers['Content-Length']))
+        state['requests'] += 1
+        state['release'].wait(5.0)
+        if state['mode'] == "error":
+            self.send_error(500)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for word in state['words']:
+            chunk = {
+                'id': "chatcmpl-stub", 'object': "chat.completion.chunk", 'created': 0, 'model': "stub",
+                'choices': [{'index': 0, 'delta': {'content': f"{word} "}, 'finish_reason': None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+@pytest.fixture
+def openai_server():
+    """A local OpenAI chat API, its state dict holds the url, mode, release event and request count"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OpenAIStub)
+    server.daemon_threads = True
+    server.state = {
+        'url': f"http://127.0.0.1:{server.server_port}/v1",
+        'mode': "ok",
+        'words': "Inspect EQ001 first and send 3 technicians".split(),
+        'release': threading.Event(),
+        'requests': 0,
+    }
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.state
+    server.state['release'].set()
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def wait_for():
+    """Poll a condition until it is true, failing the test after timeout seconds"""
+    def wait(condition, timeout=5.0):
+        deadline = time.time() + timeout
+        while not condition():
+            if time.time() > deadline:
+                pytest.fail("condition not met in time")
+            time.sleep(0.01)
+    return wait
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.alerts import AlertDetector
+
+@pytest.fixture
+def detector():
+    return AlertDetector(pd.Series(["EQ001", "EQ002", "EQ003"]), hysteresis=0.02)
+
+def test_first_cycle_sets_baseline(detector):
+    assert detector.update([0.2, 0.4, 0.8]).empty
+
+def test_level_rises_at_threshold_and_falls_only_past_hysteresis(detector):
+    detector.update([0.49, 0.2, 0.2])
+
+    alerts = detector.update([0.50, 0.2, 0.2])
+    assert alerts[['product_id', 'previous_level', 'level']].values.tolist() == [["EQ001", 1, 2]]
+
+    # Hovering just under the threshold does not flap back down
+    for score in [0.49, 0.50, 0.485, 0.499, 0.481]:
+        assert detector.update([score, 0.2, 0.2]).empty
+
+    alerts = detector.update([0.479, 0.2, 0.2])
+    assert alerts[['product_id', 'previous_level', 'level']].values.tolist() == [["EQ001", 2, 1]]
+
+def test_escalations_are_listed_before_de_escalations(detector):
+    detector.update([0.9, 0.2, 0.4])
+    alerts = detector.update([0.5, 0.35, 0.75])
+    assert alerts['product_id'].tolist() == ["EQ003", "EQ002", "EQ001"]
+
+def test_unscored_assets_keep_their_previous_score(detector):
+    # EQ003's cell has no weather yet, so it takes no baseline
+    assert detector.update([0.2, 0.4, 0.1], scored=[True, True, False]).empty
+    assert np.isnan(detector.scores[2])
+
+    alerts = detector.update([0.6, 0.4, 0.9], scored=[True, False, True])
+    assert alerts['product_id'].tolist() == ["EQ001"]
+    # Its first scored cycle is EQ003's baseline, later ones are compared with it
+    alerts = detector.update([0.6, 0.4, 0.2])
+    assert alerts['product_id'].tolist() == ["EQ003"]
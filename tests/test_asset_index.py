@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.asset_index import AssetIndex, haversine_km
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(5)
+    n = 2_000
+    return pd.DataFrame({
+        'product_id': [f"EQ{i:04d}" for i in range(n)],
+        'latitude': rng.uniform(37.70, 37.90, n),
+        'longitude': rng.uniform(-122.50, -122.40, n),
+    })
+
+@pytest.fixture(scope="module")
+def index(data):
+    return AssetIndex(data)
+
+def distances_from(data, latitude, longitude):
+    return haversine_km(latitude, longitude, data['latitude'].to_numpy(), data['longitude'].to_numpy())
+
+# Points inside the fleet, at its edge and well outside it
+POINTS = [(37.80, -122.45), (37.7001, -122.4999), (37.95, -122.30), (38.50, -121.00)]
+
+def test_position_looks_up_product_ids(index):
+    assert index.position("EQ0042") == 42
+    assert index.position("EQ9999") is None
+
+@pytest.mark.parametrize("latitude, longitude", POINTS)
+def test_nearest_matches_brute_force(data, index, latitude, longitude):
+    distances = distances_from(data, latitude, longitude)
+    assert index.nearest(latitude, longitude) == int(np.argmin(distances))
+
+@pytest.mark.parametrize("latitude, longitude", POINTS)
+def test_nearest_respects_max_km(data, index, latitude, longitude):
+    closest_km = distances_from(data, latitude, longitude).min()
+    assert index.nearest(latitude, longitude, max_km=closest_km * 0.99) is None
+    assert index.nearest(latitude, longitude, max_km=closest_km * 1.01) is not None
+
+@pytest.mark.parametrize("latitude, longitude", POINTS)
+@pytest.mark.parametrize("radius_km", [0.1, 1.5, 20.0])
+def test_within_radius_matches_brute_force(data, index, latitude, longitude, radius_km):
+    distances = distances_from(data, latitude, longitude)
+    inside = np.flatnonzero(distances <= radius_km)
+    expected = inside[np.argsort(distances[inside], kind='stable')]
+    assert index.within_radius(latitude, longitude, radius_km).tolist() == expected.tolist()
+
+@pytest.mark.parametrize("box", [
+    (37.75, -122.48, 37.78, -122.44),
+    (37.80, -122.45, 37.80, -122.45),
+    (37.0, -123.0, 38.0, -122.0),
+    (38.0, -121.0, 38.1, -120.9),
+])
+def test_within_bbox_matches_brute_force(data, index, box):
+    south, west, north, east = box
+    latitude, longitude = data['latitude'], data['longitude']
+    expected = np.flatnonzero(
+        (latitude >= south) & (latitude <= north) & (longitude >= west) & (longitude <= east)
+    )
+    assert index.within_bbox(*box).tolist() == expected.tolist()
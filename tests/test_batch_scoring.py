@@ -0,0 +1,52 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from data.sample_data import generate_fleet
+from utils.batch_scoring import parse_weather, plan_registry_parts, rank_top, run_batch, score_chunk
+from utils.data_processing import REQUIRED_COLUMNS, compact_dtypes, load_and_process_data
+from utils.weather_utils import DEFAULT_WEATHER
+
+REFERENCE_DATE = datetime(2026, 1, 1)
+STORM = {**DEFAULT_WEATHER, 'temperature': 95, 'forecast': "Thunderstorms"}
+
+@pytest.fixture
+def registry(tmp_path):
+    raw = generate_fleet(500, seed=3, reference_date=REFERENCE_DATE)[REQUIRED_COLUMNS]
+    path = tmp_path / "registry.csv"
+    raw.to_csv(path, index=False)
+    return str(path), raw
+
+def test_run_batch_writes_parts_in_registry_order(registry, tmp_path):
+    path, raw = registry
+    parts = plan_registry_parts(path, chunksize=120)
+    output = str(tmp_path / "scores.csv")
+
+    top, stats = run_batch(parts, output, top_n=10, workers=2, weather_data=STORM, chunksize=120,
+                           reference_date=REFERENCE_DATE)
+
+    assert len(parts) > 2
+    assert stats['rows'] == len(raw)
+    assert [os.path.basename(f) for f in stats['files']] == [f"part-{i:05d}.csv" for i in range(len(parts))]
+    written = pd.concat([pd.read_csv(f) for f in stats['files']], ignore_index=True)
+    assert written['product_id'].tolist() == raw['product_id'].tolist()
+
+    # The merged ranking matches ranking the whole registry at once
+    everything = score_chunk(compact_dtypes(load_and_process_data(raw.copy(), REFERENCE_DATE)), STORM)
+    expected = rank_top(everything, 10)
+    assert top['rank'].tolist() == list(range(1, 11))
+    assert top['product_id'].tolist() == expected['product_id'].tolist()
+    pd.testing.assert_series_equal(top['risk_score'], expected['risk_score'])
+
+def test_run_batch_without_output_only_ranks(registry):
+    path, raw = registry
+    top, stats = run_batch(plan_registry_parts(path, chunksize=200), top_n=5, workers=1, reference_date=REFERENCE_DATE)
+    assert stats['rows'] == len(raw) and stats['files'] == []
+    assert len(top) == 5
+
+def test_parse_weather_fills_missing_keys_from_default():
+    assert parse_weather('{"temperature": 95}') == {**DEFAULT_WEATHER, 'temperature': 95}
+    with pytest.raises(ValueError):
+        parse_weather('[95]')
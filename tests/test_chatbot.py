@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from openai import OpenAI
+
+from utils import chatbot
+from utils.chatbot import ChatExecutor, ResponseCache, get_chatbot_response, query_equipment_positions
+
+class FakeClient:
+    """Stands in for the OpenAI client, answering every completion with reply"""
+
+    def __init__(self, reply="Send 3 technicians to EQ001", error=None):
+        self.reply = reply
+        self.error = error
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, timeout=None, **kwargs):
+        self.calls.append(messages)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))])
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls time.time() as seen by the response cache"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(chatbot.time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture
+def fleet():
+    """Four transformers at the corners of a square and one pole in the middle"""
+    return pd.DataFrame({
+        'product_id': ["EQ001", "EQ002", "EQ003", "EQ004", "EQ005"],
+        'product_name': pd.Categorical(["Transformer"] * 4 + ["Power Pole"]),
+        'latitude': [37.9, 37.9, 37.7, 37.7, 37.8],
+        'longitude': [-122.5, -122.3, -122.5, -122.3, -122.4],
+        'risk_score': [0.9, 0.8, 0.7, 0.6, 0.5],
+        'customer_impact': [100, 200, 300, 400, 500],
+        'days_since_maintenance': [400, 300, 200, 100, 50],
+        'age': [30.0, 25.0, 20.0, 15.0, 10.0],
+        'temperature': [95.0, 90.0, 85.0, 80.0, 75.0],
+        'precipitation_forecast': [0.8, 0.6, 0.4, 0.2, 0.0],
+        'vegetation_proximity': [True, False, True, False, True],
+    })
+
+@pytest.mark.parametrize("query, expected", [
+    ("Which transformers are in the east?", [1, 3]),
+    ("Anything northeast", [1, 4]),
+    ("northern transformers", [0, 1]),
+    ("South-western assets", [2, 4]),
+])
+def test_query_matches_direction_words(fleet, query, expected):
+    assert query_equipment_positions(query, fleet).tolist() == expected
+
+@pytest.mark.parametrize("query", [
+    "Which transformers need at least a visit?",
+    "What a feast of beastly outages",
+    "Find the westernmost eastbound crews",
+])
+def test_query_ignores_words_containing_directions(fleet, query):
+    positions = query_equipment_positions(query, fleet)
+    expected = [0, 1, 2, 3] if "transformers" in query else None
+    assert (positions.tolist() if positions is not None else None) == expected
+
+def test_response_cache_hits_after_normalizing_question(fleet):
+    client, cache = FakeClient(), ResponseCache()
+
+    first = get_chatbot_response("What needs work?", fleet, cache=cache, llm_client=client)
+    second = get_chatbot_response("  what NEEDS   work", fleet, cache=cache, llm_client=client)
+
+    assert len(client.calls) == 1
+    assert first == {'recommendation': client.reply, 'technicians_needed': 3, 'cached': False}
+    assert second == dict(first, cached=True)
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'entries': 1}
+
+def test_response_cache_evicts_least_recently_used(fleet):
+    client, cache = FakeClient(), ResponseCache(max_entries=2)
+
+    for query in ["first question", "second question", "first question", "third question"]:
+        get_chatbot_response(query, fleet, cache=cache, llm_client=client)
+    assert len(client.calls) == 3
+
+    # "second question" was the least recently used when "third question" came in
+    get_chatbot_response("first question", fleet, cache=cache, llm_client=client)
+    assert len(client.calls) == 3
+    get_chatbot_response("second question", fleet, cache=cache, llm_client=client)
+    assert len(client.calls) == 4
+
+def test_response_cache_expires_after_ttl(fleet, clock, tmp_path):
+    client, cache = FakeClient(), ResponseCache(ttl=100, cache_dir=str(tmp_path))
+    get_chatbot_response("What needs work?", fleet, cache=cache, llm_client=client)
+
+    clock[0] += 100
+    assert get_chatbot_response("What needs work?", fleet, cache=cache, llm_client=client)['cached']
+    # Served from disk after a restart too, until the ttl has passed
+    assert get_chatbot_response("What needs work?", fleet, cache=ResponseCache(ttl=100, cache_dir=str(tmp_path)), llm_client=client)['cached']
+
+    clock[0] += 1
+    assert not get_chatbot_response("What needs work?", fleet, cache=cache, llm_client=client)['cached']
+    assert len(client.calls) == 2
+
+def test_failed_response_is_not_cached(fleet):
+    client, cache = FakeClient(error=TimeoutError("upstream timed out")), ResponseCache()
+
+    with pytest.raises(Exception, match="upstream timed out"):
+        get_chatbot_response("What needs work?", fleet, cache=cache, llm_client=client)
+    assert cache.stats()['entries'] == 0
+
+    client.error = None
+    assert not get_chatbot_response("What needs work?", fleet, cache=cache, llm_client=client)['cached']
+    assert len(client.calls) == 2
+
+@pytest.mark.parametrize("query, expected", [
+    ("Which transformers are aging?", [0, 1, 2]),
+    ("Transformers by equipment age", [0, 1, 2]),
+    ("Hot transformers near trees", [0]),
+    ("Is the old northern equipment ok?", [0, 1, 4]),
+])
+def test_query_matches_outage_reasons(fleet, query, expected):
+    assert query_equipment_positions(query, fleet).tolist() == expected
+
+def test_query_ignores_outage_reasons_no_asset_has(fleet):
+    # No asset has heavy precipitation in the forecast
+    assert query_equipment_positions("Transformers at risk of flooding", fleet).tolist() == [0, 1, 2, 3]
+    assert query_equipment_positions("Anything at risk of flooding?", fleet) is None
+
+@pytest.fixture
+def executor(openai_server):
+    """ChatExecutor streaming from the local OpenAI stub"""
+    client = OpenAI(base_url=openai_server['url'], api_key="test", max_retries=0)
+    executor = ChatExecutor(max_workers=2, timeout=5.0, cache=ResponseCache(), llm_client=client)
+    yield executor
+    executor.executor.shutdown(wait=False)
+
+def submit_together(executor, fleet, query, n):
+    """Submit the same question from n threads at once"""
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(lambda _: executor.submit(query, fleet), range(n)))
+
+def results_of(streams):
+    """Each stream's result, or its exception, waited for in parallel"""
+    def result(stream):
+        try:
+            return stream.result(timeout=5.0)
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers=len(streams)) as pool:
+        return list(pool.map(result, streams))
+
+def test_executor_coalesces_identical_questions(executor, fleet, openai_server, wait_for):
+    streams = submit_together(executor, fleet, "What needs work?", 4)
+    wait_for(lambda: openai_server['requests'] == 1)
+    assert len(executor.in_flight) == 1
+    assert all(stream is streams[0] for stream in streams)
+
+    openai_server['release'].set()
+    results = results_of(streams)
+    assert results == [{'recommendation': "Inspect EQ001 first and send 3 technicians ", 'technicians_needed': 3, 'cached': False}] * 4
+    assert openai_server['requests'] == 1
+    wait_for(lambda: not executor.in_flight)
+
+    # The finished answer is served from the cache
+    assert executor.submit("what needs work", fleet).result()['cached']
+    assert openai_server['requests'] == 1
+
+def test_executor_reports_upstream_failure_to_every_waiter(executor, fleet, openai_server, wait_for):
+    openai_server['mode'] = "error"
+    streams = submit_together(executor, fleet, "What needs work?", 4)
+    wait_for(lambda: openai_server['requests'] == 1)
+
+    openai_server['release'].set()
+    results = results_of(streams)
+    assert all(isinstance(result, Exception) and "Error getting chatbot response" in str(result) for result in results)
+    with pytest.raises(Exception, match="Error getting chatbot response"):
+        list(streams[0].iter_text(timeout=5.0))
+    wait_for(lambda: not executor.in_flight)
+    assert executor.cache.stats()['entries'] == 0
+
+    # Nothing is left behind, so asking again makes a fresh call
+    openai_server['mode'] = "ok"
+    assert not executor.submit("What needs work?", fleet).result(timeout=5.0)['cached']
+    assert openai_server['requests'] == 2
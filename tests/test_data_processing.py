@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from utils.data_processing import page_positions, sort_order
+
+@pytest.fixture(scope="module")
+def values():
+    # Few distinct values, so most rows tie
+    return np.random.default_rng(9).integers(0, 20, 1_000).astype(float)
+
+def reference_pages(values, positions, page_size, descending):
+    """Every page by sorting the selected rows in Python, ties in row order (reversed when descending)"""
+    rows = sorted(range(len(values)) if positions is None else positions.tolist(), key=lambda row: (values[row], row))
+    if descending:
+        rows = rows[::-1]
+    return [rows[start:start + page_size] for start in range(0, len(rows), page_size)]
+
+def test_sort_order_is_stable(values):
+    order = sort_order(values)
+    assert order.tolist() == sorted(range(len(values)), key=lambda row: (values[row], row))
+
+@pytest.mark.parametrize("descending", [True, False])
+@pytest.mark.parametrize("page_size", [1, 50, 333, 1_000, 5_000])
+@pytest.mark.parametrize("selection", ["all", "small", "large", "empty"])
+def test_page_positions_match_sorting_the_selection(values, descending, page_size, selection):
+    rng = np.random.default_rng(len(selection))
+    positions = {
+        'all': None,
+        'small': np.sort(rng.choice(len(values), 40, replace=False)),
+        'large': np.sort(rng.choice(len(values), 700, replace=False)),
+        'empty': np.empty(0, dtype=np.int64),
+    }[selection]
+    order = sort_order(values)
+    expected = reference_pages(values, positions, page_size, descending)
+
+    for page, rows in enumerate(expected, start=1):
+        got, total = page_positions(order, values, positions, page, page_size, descending)
+        assert got.tolist() == rows
+        assert total == (len(values) if positions is None else len(positions))
+
+    # Past the last page is empty
+    got, _ = page_positions(order, values, positions, len(expected) + 1, page_size, descending)
+    assert got.tolist() == []
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.sample_data import generate_fleet
+from utils.data_processing import REQUIRED_COLUMNS, compact_dtypes, load_and_process_data
+from utils.dispatch import DispatchPlanner, crew_sizes
+from utils.predictions import calculate_risk_scores
+
+@pytest.fixture(scope="module")
+def data():
+    return compact_dtypes(load_and_process_data(generate_fleet(5_000, seed=21)[REQUIRED_COLUMNS]))
+
+@pytest.fixture(scope="module")
+def risk(data):
+    return calculate_risk_scores(data).to_numpy()
+
+def rescored(risk, share, seed):
+    """risk with share of the assets given a new score"""
+    rng = np.random.default_rng(seed)
+    changed = rng.choice(len(risk), int(len(risk) * share), replace=False)
+    new_risk = risk.copy()
+    new_risk[changed] = rng.uniform(0, 1, len(changed))
+    return new_risk
+
+def test_crew_sizes_spread_technicians_evenly():
+    assert crew_sizes(3, 10).tolist() == [4, 3, 3]
+    assert crew_sizes(0, 10).tolist() == []
+
+@pytest.mark.parametrize("share", [0.001, 0.05, 0.5])
+@pytest.mark.parametrize("crews, technicians", [(2, 8), (5, 20), (12, 30)])
+def test_incremental_set_risk_matches_fresh_plan(data, risk, share, crews, technicians):
+    planner = DispatchPlanner(data, risk)
+    planner.plan(crews, technicians)
+
+    for seed in range(3):
+        new_risk = rescored(risk, share, seed)
+        planner.set_risk(new_risk)
+        fresh = DispatchPlanner(data, new_risk).plan(crews, technicians)
+        pd.testing.assert_frame_equal(planner.plan(crews, technicians), fresh)
+
+def test_set_risk_counts_changed_assets(data, risk):
+    planner = DispatchPlanner(data, risk)
+    assert planner.set_risk(risk) == 0
+    assert planner.set_risk(rescored(risk, 0.01, 1)) == 50
+
+def test_exhausted_pool_grows_and_shrinks_back(data, risk):
+    # Only the jobs two-person crews cannot take are worth a visit
+    big_jobs = data['product_name'].astype(str).isin(["Transformer", "Switch Gear"]).to_numpy()
+    big_job_risk = np.where(big_jobs, risk, 0.0)
+    planner = DispatchPlanner(data, big_job_risk)
+    plan = planner.plan(10, 20)
+
+    assert plan.empty
+    assert planner.pool_capacity > planner.plan_capacity
+    assert len(planner.pool_positions) < len(data)
+
+    # Even a small rescore rebuilds the pool at its planned size
+    planner.set_risk(rescored(big_job_risk, 0.01, 2))
+    assert planner.pool_capacity == planner.plan_capacity
@@ -0,0 +1,37 @@
+from contextlib import suppress
+
+import pandas as pd
+import pytest
+
+from data.sample_data import generate_fleet
+from utils.data_processing import REQUIRED_COLUMNS, compact_dtypes, load_and_process_data
+from utils.fleet_store import FleetSnapshot
+
+HOT_WEATHER = {'temperature': 95, 'forecast': "Sunny"}
+
+@pytest.fixture
+def snapshot():
+    data = compact_dtypes(load_and_process_data(generate_fleet(200, seed=7)[REQUIRED_COLUMNS]))
+    return FleetSnapshot(data, version=1)
+
+@pytest.mark.parametrize("column, value", [('age', 999.0), ('product_name', "Transformer"), ('risk_score', 0.0)])
+def test_writing_to_scored_frame_leaves_fleet_unchanged(snapshot, column, value):
+    data = snapshot.data.copy()
+    other_session = snapshot.scored(HOT_WEATHER).copy()
+
+    # Shared columns are read-only, pandas 3 copies them before writing instead
+    scored = snapshot.scored(HOT_WEATHER)
+    with suppress(ValueError):
+        scored.loc[0, column] = value
+
+    pd.testing.assert_frame_equal(snapshot.data, data)
+    pd.testing.assert_frame_equal(snapshot.scored(HOT_WEATHER), other_session)
+
+def test_snapshot_data_is_read_only(snapshot):
+    with pytest.raises(ValueError, match="read-only"):
+        snapshot.data.loc[0, 'age'] = 999.0
+
+def test_copies_of_shared_frames_are_writable(snapshot):
+    scored = snapshot.scored(HOT_WEATHER).copy()
+    scored.loc[0, 'age'] = 999.0
+    assert snapshot.data['age'].iloc[0] != 999.0
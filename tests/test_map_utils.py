@@ -0,0 +1,14 @@
+import pandas as pd
+import pytest
+
+from utils.map_utils import GEOJSON_MAX_ASSETS, MARKERS_MAX_ASSETS, create_equipment_map, map_modes
+
+def test_map_modes_default_to_level_of_detail():
+    assert map_modes(100) == ["lod", "geojson", "markers"]
+    assert map_modes(MARKERS_MAX_ASSETS + 1) == ["lod", "geojson"]
+    assert map_modes(GEOJSON_MAX_ASSETS + 1) == ["lod"]
+
+def test_create_equipment_map_refuses_markers_for_large_fleets():
+    data = pd.DataFrame({'latitude': [37.8] * (MARKERS_MAX_ASSETS + 1), 'longitude': [-122.4] * (MARKERS_MAX_ASSETS + 1)})
+    with pytest.raises(ValueError, match="too slow"):
+        create_equipment_map(data, mode="markers")
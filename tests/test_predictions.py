@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from data.sample_data import generate_fleet
+from utils.data_processing import REQUIRED_COLUMNS, load_and_process_data
+from utils.predictions import calculate_risk_score, calculate_risk_scores, get_risk_level, get_risk_levels
+from utils.weather_utils import calculate_weather_risk_factor
+
+@pytest.fixture(scope="module")
+def data():
+    fleet = load_and_process_data(generate_fleet(300, seed=11)[REQUIRED_COLUMNS])
+    # Past the caps on age, maintenance and customer impact too
+    fleet.loc[:9, 'age'] = 35.0
+    fleet.loc[:9, 'days_since_maintenance'] = 900
+    fleet.loc[:9, 'customer_impact'] = 2500
+    return fleet
+
+@pytest.mark.parametrize("weather_data", [None, {'temperature': 95, 'forecast': "Thunderstorms"}])
+def test_vectorized_scores_match_row_by_row(data, weather_data):
+    expected = [calculate_risk_score(row, weather_data) for _, row in data.iterrows()]
+    scores = calculate_risk_scores(data, weather_data)
+    assert scores.index.equals(data.index)
+    np.testing.assert_allclose(scores.to_numpy(), expected, rtol=0, atol=1e-12)
+
+def test_per_asset_weather_risk_matches_row_by_row(data):
+    weather = [{'temperature': 60, 'forecast': "Sunny"}, {'temperature': 98, 'forecast': "Heavy Rain"}]
+    cells = np.arange(len(data)) % 2
+    weather_risk = np.array([calculate_weather_risk_factor(reading) for reading in weather])[cells]
+
+    expected = [calculate_risk_score(row, weather[cell]) for (_, row), cell in zip(data.iterrows(), cells)]
+    np.testing.assert_allclose(calculate_risk_scores(data, weather_risk=weather_risk), expected, rtol=0, atol=1e-12)
+
+def test_vectorized_levels_match_row_by_row():
+    scores = calculate_risk_scores(load_and_process_data(generate_fleet(50, seed=2)[REQUIRED_COLUMNS]))
+    scores.iloc[:4] = [0.3, 0.5, 0.7, 0.29999]
+    assert get_risk_levels(scores).tolist() == [get_risk_level(score) for score in scores]
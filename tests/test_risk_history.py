@@ -0,0 +1,38 @@
+import threading
+
+import numpy as np
+
+from utils.risk_history import RiskSeries
+
+def test_concurrent_records_write_cycle_once(tmp_path):
+    series = RiskSeries(str(tmp_path), ["EQ001", "EQ002"], min_interval=300)
+    start = threading.Barrier(8)
+    results = []
+
+    def record():
+        start.wait()
+        results.append(series.record([0.4, 0.6], timestamp=1_000.0))
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False] * 7 + [True]
+    assert len(series.fleet_history('mean')[0]) == 1
+
+def test_unscored_assets_are_left_out(tmp_path):
+    series = RiskSeries(str(tmp_path), ["EQ001", "EQ002", "EQ003"])
+    series.record([0.2, 0.6, 0.8], timestamp=1_000.0)
+    series.record([0.4, np.nan, 0.6], timestamp=2_000.0)
+
+    times, values = series.asset_history(1)
+    assert times.tolist() == [1_000.0]
+    np.testing.assert_allclose(values, [0.6], atol=1e-3)
+
+    # Aggregates cover the scored assets only
+    _, means = series.fleet_history('mean')
+    np.testing.assert_allclose(means, [(0.2 + 0.6 + 0.8) / 3, 0.5], atol=1e-3)
+    _, shares = series.fleet_history('at_risk_share')
+    np.testing.assert_allclose(shares, [2 / 3, 0.5], atol=1e-3)
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from utils.search_index import SearchIndex
+
+FIELDS = ['product_id', 'product_name']
+
+@pytest.fixture
+def data():
+    names = ["Transformer", "Power Pole", "Switch Gear", "Circuit Breaker"]
+    return pd.DataFrame({
+        'product_id': [f"EQ{i:03d}" for i in range(60)],
+        'product_name': pd.Categorical([names[i % 4] for i in range(60)]),
+    })
+
+def substring_scan(rows, query):
+    """Row positions whose fields contain query, scanning every row"""
+    query = query.strip().lower()
+    return [
+        position for position, row in enumerate(rows)
+        if any(query in str(row[field]).lower() for field in FIELDS)
+    ]
+
+QUERIES = ["eq0", "EQ01", "q05", "pole", "  GEAR ", "er", "o", "breaker", "eq059", "nothing", "circuit b"]
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_substring_scan(data, query):
+    index = SearchIndex(data)
+    assert index.search(query).tolist() == substring_scan(data.to_dict('records'), query)
+
+def test_empty_query_matches_everything(data):
+    assert SearchIndex(data).search("   ") is None
+
+@pytest.mark.parametrize("query", QUERIES + ["pylon", "xf-9", "pyl"])
+def test_update_matches_substring_scan(data, query):
+    index = SearchIndex(data)
+    rows = data.astype(str).to_dict('records')
+    changes = [
+        (3, {'product_name': "Pylon"}),
+        (10, {'product_id': "XF-900"}),
+        (11, {'product_name': "Power Pole"}),
+        (3, {'product_name': "Transformer"}),
+        (60, {'product_id': "EQ060", 'product_name': "Pylon"}),
+        (62, {'product_id': "XF-901", 'product_name': "Switch Gear"}),
+    ]
+    for position, values in changes:
+        index.update(position, values)
+        while len(rows) <= position:
+            rows.append({field: "" for field in FIELDS})
+        rows[position].update(values)
+
+    assert len(index) == len(rows)
+    # Row 61 was never set and matches nothing
+    assert index.search(query).tolist() == substring_scan(rows, query)
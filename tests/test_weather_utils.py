@@ -0,0 +1,170 @@
+import os
+
+import pytest
+import requests
+
+from utils import weather_utils
+from utils.weather_utils import (
+    DEFAULT_WEATHER, WeatherCache, WeatherRefresher, create_weather_session, fetch_cell_weather,
+    fetch_noaa_weather, request_noaa_weather, weather_cell_key
+)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls time.time() as seen by the weather cache"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(weather_utils.time, "time", lambda: now[0])
+    return now
+
+def test_request_noaa_weather_parses_current_period(noaa_server):
+    weather = request_noaa_weather(37.8, -122.45, noaa_server['url'])
+
+    assert weather == {
+        'temperature': 72,
+        'temperature_unit': "F",
+        'forecast': "Sunny",
+        'wind_speed': "10 mph",
+        'wind_direction': "W",
+        'is_daytime': True,
+    }
+    assert noaa_server['requests'] == {'points': 1, 'forecast': 1}
+
+def test_request_noaa_weather_times_out(noaa_server):
+    noaa_server['mode'] = "slow"
+    with pytest.raises(requests.Timeout):
+        request_noaa_weather(37.8, -122.45, noaa_server['url'], timeout=0.2)
+
+@pytest.mark.parametrize("mode", ["error", "slow"])
+def test_fetch_noaa_weather_falls_back_to_defaults(noaa_server, mode):
+    noaa_server['mode'] = mode
+    weather = fetch_noaa_weather(37.8, -122.45, noaa_server['url'], timeout=0.2)
+    assert weather == DEFAULT_WEATHER
+
+def test_fetch_cell_weather_fetches_each_cell_once(noaa_server):
+    cache = WeatherCache(ttl=60)
+    lats, lons = [37.7125, 37.8375], [-122.4625, -122.4125]
+
+    first = fetch_cell_weather(lats, lons, cache, noaa_server['url'])
+    second = fetch_cell_weather(lats, lons, cache, noaa_server['url'])
+
+    assert [reading['temperature'] for reading in first] == [72, 72]
+    assert second == first
+    assert noaa_server['requests'] == {'points': 2, 'forecast': 2}
+
+def test_fetch_cell_weather_caches_failures_for_failure_ttl(noaa_server, clock):
+    noaa_server['mode'] = "error"
+    cache = WeatherCache(ttl=1800)
+    session = create_weather_session(retries=0)
+
+    readings = fetch_cell_weather([37.7125], [-122.4625], cache, noaa_server['url'], failure_ttl=300, session=session)
+    assert readings == [DEFAULT_WEATHER]
+    assert noaa_server['requests']['points'] == 1
+
+    # The default reading is served without retrying until failure_ttl has passed
+    noaa_server['mode'] = "ok"
+    clock[0] += 299
+    assert fetch_cell_weather([37.7125], [-122.4625], cache, noaa_server['url'], session=session) == [DEFAULT_WEATHER]
+    assert noaa_server['requests']['points'] == 1
+
+    clock[0] += 2
+    readings = fetch_cell_weather([37.7125], [-122.4625], cache, noaa_server['url'], session=session)
+    assert readings[0]['temperature'] == 72
+    assert noaa_server['requests']['points'] == 2
+
+def test_weather_cache_expires_after_ttl_and_stale_window(tmp_path, clock):
+    cache = WeatherCache(ttl=100, stale_ttl=50, cache_dir=str(tmp_path))
+    cache.set("cell", {'temperature': 80})
+
+    clock[0] += 100
+    assert cache.get("cell") == {'temperature': 80}
+
+    # Past the ttl the entry is stale: get misses, get_entry still serves it
+    clock[0] += 1
+    assert cache.get("cell") is None
+    assert cache.get_entry("cell")['weather'] == {'temperature': 80}
+
+    # Past the stale window it is gone from memory and disk
+    clock[0] += 50
+    assert cache.get_entry("cell") is None
+    assert not os.path.exists(tmp_path / "cell.json")
+
+def test_weather_cache_is_shared_through_disk(tmp_path, clock):
+    WeatherCache(ttl=100, cache_dir=str(tmp_path)).set("cell", {'temperature': 80})
+
+    restarted = WeatherCache(ttl=100, cache_dir=str(tmp_path))
+    assert restarted.get("cell") == {'temperature': 80}
+
+    clock[0] += 101
+    assert restarted.get("cell") is None
+
+def test_weather_cache_remembers_keys_missing_from_disk(tmp_path, clock):
+    cache = WeatherCache(ttl=100, cache_dir=str(tmp_path), negative_ttl=60)
+    assert cache.get_entry("cell") is None
+
+    # Written by another process: not looked up again until negative_ttl passes
+    WeatherCache(ttl=100, cache_dir=str(tmp_path)).set("cell", {'temperature': 80})
+    assert cache.get_entry("cell") is None
+    clock[0] += 61
+    assert cache.get("cell") == {'temperature': 80}
+
+def test_weather_cache_set_clears_missing_key(tmp_path, clock):
+    cache = WeatherCache(ttl=100, cache_dir=str(tmp_path), negative_ttl=60)
+    assert cache.get_entry("cell") is None
+    cache.set("cell", {'temperature': 80})
+    assert cache.get("cell") == {'temperature': 80}
+
+def test_refresher_serves_defaults_then_fetched_readings(noaa_server, wait_for):
+    refresher = WeatherRefresher(WeatherCache(ttl=60), noaa_server['url'])
+
+    readings, ages = refresher.get_readings([37.7125], [-122.4625])
+    assert readings == [DEFAULT_WEATHER]
+    assert ages == [None]
+
+    wait_for(lambda: refresher.version == 1)
+    readings, ages = refresher.get_readings([37.7125], [-122.4625])
+    assert readings[0]['temperature'] == 72
+    assert ages[0] is not None
+    assert noaa_server['requests']['points'] == 1
+
+def test_refresher_serves_stale_reading_while_revalidating(noaa_server, wait_for):
+    cache = WeatherCache(ttl=60, stale_ttl=3600)
+    key = weather_cell_key(37.7125, -122.4625)
+    cache.set(key, {**DEFAULT_WEATHER, 'temperature': 50}, ttl=0)
+    refresher = WeatherRefresher(cache, noaa_server['url'])
+
+    # The stale reading is returned at once and refreshed in the background
+    readings, _ = refresher.get_readings([37.7125], [-122.4625])
+    assert readings[0]['temperature'] == 50
+
+    wait_for(lambda: refresher.version == 1)
+    readings, _ = refresher.get_readings([37.7125], [-122.4625])
+    assert readings[0]['temperature'] == 72
+
+def test_refresher_keeps_stale_reading_and_backs_off_on_failure(noaa_server, wait_for):
+    noaa_server['mode'] = "error"
+    cache = WeatherCache(ttl=60, stale_ttl=3600)
+    key = weather_cell_key(37.7125, -122.4625)
+    cache.set(key, {**DEFAULT_WEATHER, 'temperature': 50}, ttl=0)
+    refresher = WeatherRefresher(cache, noaa_server['url'], failure_ttl=300)
+    refresher.session = create_weather_session(retries=0)
+
+    refresher.get_readings([37.7125], [-122.4625])
+    wait_for(lambda: key in refresher.retry_after and not refresher.pending)
+
+    # Still stale, but not retried within failure_ttl
+    readings, _ = refresher.get_readings([37.7125], [-122.4625])
+    assert readings[0]['temperature'] == 50
+    assert refresher.version == 0
+    assert noaa_server['requests']['points'] == 1
+
+def test_refresher_evicts_cells_nobody_reads_again(tmp_path, noaa_server, wait_for):
+    cache = WeatherCache(ttl=60, cache_dir=str(tmp_path))
+    key = weather_cell_key(37.7125, -122.4625)
+    cache.set(key, DEFAULT_WEATHER)
+    cache.store.write("abandoned", {'fetched_at': 0, 'ttl': 60, 'weather': DEFAULT_WEATHER})
+    refresher = WeatherRefresher(cache, noaa_server['url'], evict_interval=0)
+
+    refresher.get_readings([37.7125], [-122.4625])
+    wait_for(lambda: not os.path.exists(tmp_path / "abandoned.json"))
+    assert os.path.exists(tmp_path / f"{key}.json")
+    assert noaa_server['requests']['points'] == 0
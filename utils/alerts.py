@@ -0,0 +1,101 @@
+import time
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+
+from utils.tracing import traced
+
+# Levels of get_risk_level, as int8 codes 0-3, and the scores where they start
+RISK_LEVELS = ['Low', 'Medium', 'High', 'Critical']
+LEVEL_THRESHOLDS = np.array([0.3, 0.5, 0.7])
+
+ALERT_COLUMNS = ['timestamp', 'position', 'product_id', 'previous_level', 'level', 'previous_score', 'risk_score']
+
+def risk_level_codes(risk_scores, offset=0.0):
+    """Level code of every score as get_risk_level buckets it, after adding offset"""
+    return np.searchsorted(LEVEL_THRESHOLDS, np.asarray(risk_scores) + offset, side='right').astype(np.int8)
+
+class AlertDetector:
+    """
+    Emits the assets whose risk level changed since the previous scoring cycle
+    Previous scores and levels are kept as float32 and int8 arrays, and only
+    the assets whose score changed are re-bucketed. An asset moves up a level
+    as soon as its score crosses the threshold, but only moves back down once
+    it is hysteresis below it, so scores hovering at a threshold do not flap.
+    The newest max_feed alerts are kept as a feed for the dashboard
+    """
+
+    def __init__(self, asset_ids, hysteresis=0.02, max_feed=500):
+        self.asset_ids = asset_ids
+        self.hysteresis = hysteresis
+        self.scores = None
+        self.levels = None
+        self.feed_records = deque(maxlen=max_feed)
+        self.cycles = 0
+        self.lock = threading.Lock()
+
+    @traced()
+    def update(self, risk_scores, timestamp=None, scored=None):
+        """
+        Compare a new score for every asset with the previous cycle and return
+        the level changes as a DataFrame. scored masks the assets whose score
+        counts this cycle (all by default), the others keep their previous
+        score. An asset's first counted score only sets its baseline
+        """
+        # Bucketed at full precision like get_risk_levels, stored as float32
+        values = np.asarray(risk_scores, dtype=float)
+        scores = values.astype(np.float32)
+        scored = np.ones(len(values), dtype=bool) if scored is None else np.asarray(scored, dtype=bool)
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            self.cycles += 1
+            if self.scores is None:
+                self.scores = np.full(len(values), np.nan, dtype=np.float32)
+                self.levels = np.zeros(len(values), dtype=np.int8)
+            baseline = scored & np.isnan(self.scores)
+            self.scores[baseline] = scores[baseline]
+            self.levels[baseline] = risk_level_codes(values[baseline])
+
+            changed = np.flatnonzero(scored & ~baseline & (scores != self.scores))
+            new_scores = scores[changed]
+            levels = self.levels[changed]
+            raised = risk_level_codes(values[changed])
+            # Level the score would fall to once it is hysteresis below a threshold
+            lowered = risk_level_codes(values[changed], self.hysteresis)
+            new_levels = np.where(raised > levels, raised, np.minimum(levels, lowered))
+
+            moved = new_levels != levels
+            positions = changed[moved]
+            alerts = pd.DataFrame({
+                'timestamp': timestamp,
+                'position': positions,
+                'product_id': self.asset_ids.iloc[positions].to_numpy(),
+                'previous_level': levels[moved],
+                'level': new_levels[moved],
+                'previous_score': self.scores[positions],
+                'risk_score': new_scores[moved],
+            }, columns=ALERT_COLUMNS)
+
+            self.scores[changed] = new_scores
+            self.levels[changed] = new_levels
+            # Escalations first, most severe at the top
+            escalated = alerts['level'] > alerts['previous_level']
+            alerts = alerts.assign(escalated=escalated).sort_values(
+                ['escalated', 'level', 'risk_score'], ascending=False, kind='stable', ignore_index=True
+            ).drop(columns='escalated')
+            self.feed_records.extendleft(reversed(alerts.to_dict('records')))
+            return alerts
+
+    def feed(self, limit=None, escalations_only=False):
+        """Newest alerts first, with the levels as names"""
+        with self.lock:
+            records = list(self.feed_records)
+        feed = pd.DataFrame(records, columns=ALERT_COLUMNS)
+        if escalations_only:
+            feed = feed[feed['level'] > feed['previous_level']]
+        if limit is not None:
+            feed = feed.head(limit)
+        for column in ('previous_level', 'level'):
+            feed[column] = pd.Categorical.from_codes(feed[column].astype(np.int8), RISK_LEVELS, ordered=True)
+        return feed.reset_index(drop=True)
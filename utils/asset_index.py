@@ -0,0 +1,144 @@
+import numpy as np
+
+from utils.tracing import traced
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+# Grid cells are keyed by (row + offset) * span + (col + offset) in one int64
+_CELL_OFFSET = 1 << 20
+_CELL_SPAN = 1 << 21
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km, works on scalars and NumPy arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2 +
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+class AssetIndex:
+    """
+    Lookup structures over one version of the equipment data
+    Maps product_id to row position in O(1) and buckets coordinates into a
+    uniform lat/lon grid for nearest, radius and bounding box queries.
+    All query results are row positions for use with data.iloc
+    """
+
+    def __init__(self, data, cell_size=0.01):
+        self.cell_size = cell_size
+        self.size = len(data)
+
+        # Hash index on product_id
+        self.positions = dict(zip(data['product_id'].astype(str), range(len(data))))
+
+        # Spatial grid, rows sorted by cell so each cell is a contiguous slice
+        self.latitude = data['latitude'].to_numpy(dtype=float)
+        self.longitude = data['longitude'].to_numpy(dtype=float)
+        keys = self._cell_keys(self.latitude, self.longitude)
+        self.order = np.argsort(keys, kind='stable')
+        cell_keys, starts, counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+        self.cells = dict(zip(cell_keys.tolist(), zip(starts.tolist(), counts.tolist())))
+
+    def _cell_coords(self, latitude, longitude):
+        row = np.floor(np.asarray(latitude) / self.cell_size).astype(np.int64)
+        col = np.floor(np.asarray(longitude) / self.cell_size).astype(np.int64)
+        return row, col
+
+    def _cell_keys(self, latitude, longitude):
+        row, col = self._cell_coords(latitude, longitude)
+        return (row + _CELL_OFFSET) * _CELL_SPAN + (col + _CELL_OFFSET)
+
+    def _cell_positions(self, rows, cols):
+        """Row positions of all equipment in the given grid cells"""
+        slices = []
+        for row in rows:
+            for col in cols:
+                cell = self.cells.get(int((row + _CELL_OFFSET) * _CELL_SPAN + (col + _CELL_OFFSET)))
+                if cell is not None:
+                    start, count = cell
+                    slices.append(self.order[start:start + count])
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def position(self, product_id):
+        """Row position of an equipment id, or None if it is unknown"""
+        return self.positions.get(str(product_id))
+
+    def within_bbox(self, south, west, north, east):
+        """Row positions of equipment inside a lat/lon bounding box"""
+        (row_min, row_max), (col_min, col_max) = self._cell_coords([south, north], [west, east])
+
+        # Very large boxes are cheaper as a single vectorized scan
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.cells):
+            candidates = np.arange(self.size)
+        else:
+            candidates = self._cell_positions(range(row_min, row_max + 1), range(col_min, col_max + 1))
+
+        latitude = self.latitude[candidates]
+        longitude = self.longitude[candidates]
+        inside = (latitude >= south) & (latitude <= north) & (longitude >= west) & (longitude <= east)
+        return np.sort(candidates[inside])
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """Row positions of equipment within radius_km of a point, nearest first"""
+        lat_delta = radius_km / KM_PER_DEGREE
+        lon_delta = radius_km / (KM_PER_DEGREE * max(np.cos(np.radians(latitude)), 1e-6))
+        candidates = self.within_bbox(
+            latitude - lat_delta, longitude - lon_delta,
+            latitude + lat_delta, longitude + lon_delta
+        )
+
+        distances = haversine_km(latitude, longitude, self.latitude[candidates], self.longitude[candidates])
+        inside = distances <= radius_km
+        return candidates[inside][np.argsort(distances[inside], kind='stable')]
+
+    @traced()
+    def nearest(self, latitude, longitude, max_km=None, max_rings=8):
+        """
+        Row position of the equipment closest to a point, or None if there is
+        none within max_km. Searches rings of grid cells outwards and falls
+        back to a full scan when nothing is found within max_rings
+        """
+        if self.size == 0:
+            return None
+
+        row, col = self._cell_coords(latitude, longitude)
+        # Smallest cell edge in km over the searched rows, a ring of radius r
+        # covers at least r of these
+        widest_lat = min(abs(latitude) + (max_rings + 1) * self.cell_size, 89.9)
+        cell_km = self.cell_size * KM_PER_DEGREE * np.cos(np.radians(widest_lat))
+        rings = max_rings if max_km is None else min(max_rings, int(np.ceil(max_km / cell_km)))
+
+        best, best_km = None, np.inf
+        for ring in range(rings + 1):
+            candidates = self._ring_positions(int(row), int(col), ring)
+            if len(candidates):
+                distances = haversine_km(latitude, longitude, self.latitude[candidates], self.longitude[candidates])
+                closest = int(np.argmin(distances))
+                if distances[closest] < best_km:
+                    best, best_km = int(candidates[closest]), float(distances[closest])
+            # Anything in further rings is at least ring * cell_km away
+            if best is not None and best_km <= ring * cell_km:
+                break
+            if max_km is not None and max_km <= ring * cell_km:
+                break
+        else:
+            distances = haversine_km(latitude, longitude, self.latitude, self.longitude)
+            best = int(np.argmin(distances))
+            best_km = float(distances[best])
+
+        if best is None or (max_km is not None and best_km > max_km):
+            return None
+        return best
+
+    def _ring_positions(self, row, col, ring):
+        """Row positions of equipment in the square ring of cells at distance ring"""
+        if ring == 0:
+            return self._cell_positions([row], [col])
+        rows = range(row - ring, row + ring + 1)
+        edges = [
+            self._cell_positions([row - ring, row + ring], range(col - ring, col + ring + 1)),
+            self._cell_positions(rows[1:-1], [col - ring, col + ring]),
+        ]
+        return np.concatenate(edges)
@@ -0,0 +1,345 @@
+"""
+Score a whole equipment registry outside the dashboard, e.g. for nightly planning
+
+    python -m utils.batch_scoring registry.parquet --output scores.parquet --top-output top.csv
+    python -m utils.batch_scoring --sample 1000000 --output scores.csv --top 500 --workers 8
+    python -m utils.batch_scoring registry.csv --weather '{"temperature": 95, "forecast": "Thunderstorms"}'
+
+The registry is split into parts from its metadata alone: Parquet row groups,
+Arrow IPC record batches, CSV byte ranges or synthetic fleet chunks. Each
+worker process loads its part, runs it through load_and_process_data, scores,
+costs and gives it its outage reasons, and writes it to its own part file in
+the output directory. Only the part file's path and the part's top N assets
+come back, and the parent ranks the top N across all parts
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processing import (
+    REQUIRED_COLUMNS, compact_dtypes, decode_outage_reasons, load_and_process_data, outage_reason_flags,
+    validate_registry_columns
+)
+from utils.predictions import calculate_risk_scores, get_risk_levels
+from utils.weather_utils import DEFAULT_WEATHER
+from utils.cost_analysis import calculate_cost_impacts
+
+OUTPUT_COLUMNS = [
+    'product_id', 'product_name', 'latitude', 'longitude', 'customer_impact', 'age', 'days_since_maintenance',
+    'risk_score', 'risk_level', 'preventative_cost', 'repair_cost', 'savings', 'customer_impact_cost',
+    'expected_repair_cost', 'possible_outage',
+]
+
+def score_chunk(chunk, weather_data=None):
+    """Risk, cost impact and possible outage reasons of every asset in a processed chunk"""
+    risk_scores = calculate_risk_scores(chunk, weather_data)
+    costs = calculate_cost_impacts(chunk)
+    scored = pd.DataFrame({
+        'product_id': chunk['product_id'].astype(str),
+        'product_name': chunk['product_name'].astype(str),
+        'latitude': chunk['latitude'],
+        'longitude': chunk['longitude'],
+        'customer_impact': chunk['customer_impact'],
+        'age': chunk['age'],
+        'days_since_maintenance': chunk['days_since_maintenance'],
+        'risk_score': risk_scores.astype(np.float32),
+        'risk_level': get_risk_levels(risk_scores),
+        **{column: costs[column] for column in costs.columns},
+        'expected_repair_cost': costs['repair_cost'] * risk_scores,
+        'possible_outage': decode_outage_reasons(outage_reason_flags(chunk)),
+    }, columns=OUTPUT_COLUMNS)
+    return scored.reset_index(drop=True)
+
+def rank_top(scored, n):
+    """The n riskiest rows, ties broken by customer impact, highest first"""
+    order = np.lexsort((-scored['customer_impact'].to_numpy(), -scored['risk_score'].to_numpy()))[:n]
+    return scored.iloc[order].reset_index(drop=True)
+
+def _group_parts(counts, chunksize):
+    """Consecutive indexes grouped into parts of at least chunksize rows"""
+    parts, current, rows = [], [], 0
+    for i, count in enumerate(counts):
+        current.append(i)
+        rows += count
+        if rows >= chunksize:
+            parts.append(current)
+            current, rows = [], 0
+    if current:
+        parts.append(current)
+    return parts
+
+def _plan_parquet_parts(path, chunksize):
+    import pyarrow.parquet as pq
+
+    metadata = pq.ParquetFile(path).metadata
+    validate_registry_columns(metadata.schema.to_arrow_schema().names, path)
+    counts = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    return [{'format': 'parquet', 'path': path, 'row_groups': groups} for groups in _group_parts(counts, chunksize)]
+
+def _plan_arrow_parts(path, chunksize):
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        validate_registry_columns(reader.schema.names, path)
+        counts = [reader.get_batch(i).num_rows for i in range(reader.num_record_batches)]
+    return [{'format': 'arrow', 'path': path, 'batches': batches} for batches in _group_parts(counts, chunksize)]
+
+def _plan_csv_parts(path, chunksize):
+    validate_registry_columns(pd.read_csv(path, nrows=0).columns, path)
+    size = os.path.getsize(path)
+    parts = []
+    with open(path, 'rb') as f:
+        f.readline()
+        start = f.tell()
+        # Byte ranges are sized from the rows at the top of the file and end on a line break
+        sample = f.read(1 << 20)
+        bytes_per_row = len(sample) / max(sample.count(b"\n"), 1)
+        part_bytes = max(int(bytes_per_row * chunksize), 1)
+        while start < size:
+            f.seek(min(start + part_bytes, size))
+            f.readline()
+            end = f.tell()
+            parts.append({'format': 'csv', 'path': path, 'start': start, 'end': end})
+            start = end
+    return parts
+
+PART_PLANNERS = {
+    '.parquet': _plan_parquet_parts,
+    '.pq': _plan_parquet_parts,
+    '.arrow': _plan_arrow_parts,
+    '.feather': _plan_arrow_parts,
+    '.ipc': _plan_arrow_parts,
+    '.csv': _plan_csv_parts,
+}
+
+def plan_registry_parts(path, chunksize=250_000):
+    """
+    Descriptors of the parts of a registry of about chunksize rows each, in
+    registry order. Only the file's metadata is read, the rows are loaded by
+    whoever scores the part
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in PART_PLANNERS:
+        raise ValueError(f"Unsupported registry format: {extension}")
+    return PART_PLANNERS[extension](path, chunksize)
+
+def plan_sample_parts(n_assets, chunksize):
+    """Descriptors of a synthetic fleet, one per generated chunk"""
+    n_chunks = -(-n_assets // chunksize) if n_assets else 0
+    return [{'format': 'sample', 'n_assets': n_assets, 'chunk': i} for i in range(n_chunks)]
+
+def iter_part_chunks(part, chunksize, reference_date):
+    """Processed chunks of at most chunksize rows of the part a descriptor names"""
+    columns = REQUIRED_COLUMNS
+    if part['format'] == 'parquet':
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(part['path'], memory_map=True)
+        raw_chunks = (
+            batch.to_pandas()
+            for batch in parquet_file.iter_batches(batch_size=chunksize, row_groups=part['row_groups'], columns=columns)
+        )
+    elif part['format'] == 'arrow':
+        import pyarrow as pa
+
+        def read_batches():
+            with pa.memory_map(part['path']) as source:
+                reader = pa.ipc.open_file(source)
+                for i in part['batches']:
+                    batch = reader.get_batch(i).select(columns)
+                    for offset in range(0, batch.num_rows, chunksize):
+                        yield batch.slice(offset, chunksize).to_pandas()
+        raw_chunks = read_batches()
+    elif part['format'] == 'csv':
+        with open(part['path'], 'rb') as f:
+            header = f.readline()
+            f.seek(part['start'])
+            body = f.read(part['end'] - part['start'])
+        raw_chunks = pd.read_csv(io.BytesIO(header + body), usecols=columns, chunksize=chunksize)
+    elif part['format'] == 'sample':
+        from data.sample_data import generate_fleet_chunks
+
+        raw_chunks = (
+            chunk[columns] for chunk in generate_fleet_chunks(
+                part['n_assets'], chunk_size=chunksize, reference_date=reference_date, chunk_indices=[part['chunk']]
+            )
+        )
+    else:
+        raise ValueError(f"Unknown part format: {part['format']}")
+
+    for chunk in raw_chunks:
+        yield compact_dtypes(load_and_process_data(chunk, reference_date))
+
+def _score_worker(part, part_path, weather_data, top_n, chunksize, reference_date):
+    """Load, score and write one part, returning its file, row count and top_n ranking"""
+    writer = ScoreWriter(part_path) if part_path else None
+    tops, rows = [], 0
+    try:
+        for chunk in iter_part_chunks(part, chunksize, reference_date):
+            scored = score_chunk(chunk, weather_data)
+            if writer is not None:
+                writer.write(scored)
+            tops.append(rank_top(scored, top_n))
+            rows += len(scored)
+    finally:
+        if writer is not None:
+            writer.close()
+    top = rank_top(pd.concat(tops, ignore_index=True), top_n) if tops else None
+    return part_path, rows, top
+
+class ScoreWriter:
+    """Appends scored chunks to one Parquet or CSV file, picked by extension"""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+        self.writer = None
+        self.rows = 0
+
+    def write(self, scored):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(scored, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            scored.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        self.rows += len(scored)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def write_table(data, path):
+    if os.path.splitext(path)[1].lower() in ('.parquet', '.pq'):
+        data.to_parquet(path, index=False)
+    else:
+        data.to_csv(path, index=False)
+
+def part_paths(output, n_parts):
+    """
+    Part file paths in the output directory, Parquet or CSV by the directory's
+    extension (Parquet without one). Part files of an earlier run are removed
+    """
+    extension = os.path.splitext(output)[1].lower()
+    extension = extension if extension in ('.parquet', '.pq', '.csv') else '.parquet'
+    os.makedirs(output, exist_ok=True)
+    for stale in glob.glob(os.path.join(output, "part-*")):
+        os.remove(stale)
+    return [os.path.join(output, f"part-{i:05d}{extension}") for i in range(n_parts)]
+
+def run_batch(parts, output=None, top_n=100, workers=None, weather_data=None, chunksize=250_000, reference_date=None):
+    """
+    Score parts across worker processes. With output, every worker writes its
+    part to its own file in that directory, numbered in registry order. At
+    most two parts per worker are in flight, and only the top_n of each part
+    comes back, so the parent's memory stays bounded however large the registry is
+    Returns the global top_n ranking and stats with rows, parts, files and seconds
+    """
+    workers = workers or os.cpu_count() or 1
+    reference_date = reference_date if reference_date is not None else datetime.now()
+    paths = part_paths(output, len(parts)) if output else [None] * len(parts)
+    tops, files, rows = [], [], 0
+    start = time.perf_counter()
+
+    def collect(future):
+        nonlocal rows
+        part_path, part_rows, top = future.result()
+        if top is not None:
+            tops.append(top)
+        if part_path and part_rows:
+            files.append(part_path)
+        rows += part_rows
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for part, part_path in zip(parts, paths):
+            pending.append(executor.submit(
+                _score_worker, part, part_path, weather_data, top_n, chunksize, reference_date
+            ))
+            if len(pending) >= 2 * workers:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+
+    top = rank_top(pd.concat(tops, ignore_index=True), top_n) if tops else pd.DataFrame(columns=OUTPUT_COLUMNS)
+    top.insert(0, 'rank', np.arange(1, len(top) + 1))
+    stats = {
+        'rows': rows, 'parts': len(parts), 'files': files, 'workers': workers,
+        'seconds': time.perf_counter() - start,
+    }
+    return top, stats
+
+def parse_weather(text):
+    """
+    Weather reading from a JSON object, e.g. '{"temperature": 95}'. Keys it
+    leaves out come from the default reading, so scoring never falls back
+    for want of a forecast
+    """
+    reading = json.loads(text)
+    if not isinstance(reading, dict):
+        raise ValueError("the weather reading must be a JSON object")
+    return {**DEFAULT_WEATHER, **reading}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score an equipment registry and rank the riskiest assets")
+    parser.add_argument("registry", nargs="?", help="Parquet, Arrow IPC/Feather or CSV registry")
+    parser.add_argument("--sample", type=int, help="score a synthetic fleet of this many assets instead")
+    parser.add_argument(
+        "--output", help="directory of part files for every scored asset, Parquet or CSV by its extension"
+    )
+    parser.add_argument("--top", type=int, default=100, help="assets in the global ranking")
+    parser.add_argument("--top-output", help="Parquet or CSV file for the ranking, printed when omitted")
+    parser.add_argument("--workers", type=int, help="worker processes, default one per core")
+    parser.add_argument("--chunksize", type=int, default=250_000, help="rows per part and per chunk a worker holds")
+    parser.add_argument(
+        "--weather",
+        help="NOAA-style reading as JSON, e.g. '{\"temperature\": 95, \"forecast\": \"Thunderstorms\"}', "
+             "missing keys take the default reading"
+    )
+    args = parser.parse_args(argv)
+
+    if (args.registry is None) == (args.sample is None):
+        parser.error("give either a registry file or --sample")
+
+    if args.sample is not None:
+        parts = plan_sample_parts(args.sample, args.chunksize)
+    else:
+        parts = plan_registry_parts(args.registry, args.chunksize)
+    try:
+        weather_data = parse_weather(args.weather) if args.weather else None
+    except ValueError as e:
+        parser.error(f"--weather: {e}")
+
+    top, stats = run_batch(parts, args.output, args.top, args.workers, weather_data, args.chunksize, datetime.now())
+
+    if args.top_output:
+        write_table(top, args.top_output)
+        print(f"Wrote the top {len(top):,} assets to {args.top_output}")
+    else:
+        print(top.head(args.top).to_string(index=False))
+    if args.output:
+        print(f"Wrote {stats['rows']:,} scored assets to {len(stats['files']):,} part files in {args.output}")
+
+    rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+    print(
+        f"Scored {stats['rows']:,} assets in {stats['parts']:,} parts on {stats['workers']} workers "
+        f"in {stats['seconds']:.1f} s ({rate:,.0f} assets/sec)"
+    )
+
+if __name__ == "__main__":
+    sys.exit(main())
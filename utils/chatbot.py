@@ -1,35 +1,259 @@
 import os
-from openai import OpenAI
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import json
+import numpy as np
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+from utils.data_processing import OUTAGE_REASONS, decode_outage_reasons, get_outage_flags, outage_reason_mask
+from utils.json_store import JsonFileStore
+from utils.tracing import traced
 
-def get_chatbot_response(query, equipment_data):
-    """Get AI response for maintenance queries"""
-    try:
-        # Convert equipment data to a format suitable for the prompt
-        equipment_list = []
-        for _, equip in equipment_data.iterrows():
-            equipment_list.append({
-                "product_id": equip["product_id"],
-                "product_name": equip["product_name"],
-                "risk_score": float(equip["risk_score"]),
-                "customer_impact": int(equip["customer_impact"]),
-                "days_since_maintenance": int(equip["days_since_maintenance"]),
-                "age": float(equip["age"]),
-                "temperature": float(equip["temperature"]),
-                "precipitation_forecast": float(equip["precipitation_forecast"]),
-                "vegetation_proximity": bool(equip["vegetation_proximity"])
-            })
-
-        # Sort equipment by risk and impact
-        equipment_list.sort(key=lambda x: (x["risk_score"], x["customer_impact"]), reverse=True)
-
-        # Create the prompt
-        prompt = f"""
+# OpenAI client, created by get_client() the first time the chatbot is used
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Shared OpenAI client, importing the SDK and creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+
+                _client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    return _client
+
+CHAT_MODEL = "gpt-4o"  # the newest OpenAI model released May 13, 2024
+
+# Seconds to wait for the API, and for each streamed chunk
+CHAT_TIMEOUT = 60
+
+# Equipment fields sent to the model, with the type each is serialized as
+PROMPT_FIELDS = {
+    "product_id": str,
+    "product_name": str,
+    "risk_score": float,
+    "customer_impact": int,
+    "days_since_maintenance": int,
+    "age": float,
+    "temperature": float,
+    "precipitation_forecast": float,
+    "vegetation_proximity": bool,
+}
+
+# Rough prompt size estimate used for the token budget
+CHARS_PER_TOKEN = 4
+
+# Words that narrow a question to assets with a possible outage reason
+OUTAGE_REASON_WORDS = {
+    "age": "Equipment Age", "aging": "Equipment Age", "ageing": "Equipment Age",
+    "overdue": "Maintenance Overdue",
+    "vegetation": "Vegetation Proximity", "trees": "Vegetation Proximity",
+    "heat": "High Temperature", "hot": "High Temperature",
+    "precipitation": "Heavy Precipitation", "rain": "Heavy Precipitation", "flooding": "Heavy Precipitation",
+}
+
+DIRECTIONS = {
+    "north": ("latitude", 1), "south": ("latitude", -1),
+    "east": ("longitude", 1), "west": ("longitude", -1),
+}
+
+# north, southwest, eastern, northwestern, ...
+DIRECTION_WORD = re.compile(r"(north|south)?(east|west)?(?:ern)?")
+
+def top_equipment_positions(data, k=5, positions=None):
+    """
+    Row positions of the k assets with the highest (risk_score, customer_impact),
+    highest first, optionally among the given positions only
+    Uses a partial selection, so only about k rows are ever sorted
+    """
+    risk = data['risk_score'].to_numpy()
+    impact = data['customer_impact'].to_numpy()
+    if positions is not None:
+        risk, impact = risk[positions], impact[positions]
+    k = min(k, len(risk))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Everything scoring at least the k-th highest risk, ties on the boundary
+    # are then ordered by customer impact
+    threshold = np.partition(risk, len(risk) - k)[len(risk) - k]
+    candidates = np.flatnonzero(risk >= threshold)
+    order = np.lexsort((-impact[candidates], -risk[candidates]))[:k]
+    selected = candidates[order]
+    return selected if positions is None else np.asarray(positions)[selected]
+
+def query_equipment_positions(query, data):
+    """
+    Row positions of the equipment a question refers to, or None if it names
+    none. Understands equipment ids, which take precedence, then product types
+    (singular or plural), north/south/east/west parts of the network and
+    outage reasons such as "overdue" or "vegetation", which all have to match.
+    Reasons that would leave no equipment are ignored
+    """
+    words = re.findall(r"[a-z0-9]+", query.lower())
+    text = " ".join(words)
+    mask = None
+
+    def narrow(matches):
+        nonlocal mask
+        mask = matches if mask is None else mask & matches
+
+    # Ids are looked up as written and upper-cased, never by scanning every id
+    tokens = {token for token in re.findall(r"[A-Za-z0-9_-]+", query) if any(c.isdigit() for c in token)}
+    if tokens:
+        candidates = list(tokens | {token.upper() for token in tokens})
+        ids = data['product_id']
+        if hasattr(ids, 'cat'):
+            codes = ids.cat.categories.get_indexer(candidates)
+            matches = np.isin(ids.cat.codes.to_numpy(), codes[codes >= 0])
+        else:
+            matches = ids.isin(candidates).to_numpy()
+        if matches.any():
+            # Named equipment is what the question is about, whatever else it says
+            return np.flatnonzero(matches)
+
+    names = data['product_name']
+    known_names = names.cat.categories if hasattr(names, 'cat') else names.unique()
+    mentioned_names = [
+        name for name in known_names
+        if re.search(rf"\b{re.escape(str(name).lower())}s?\b", text)
+    ]
+    if mentioned_names:
+        narrow(names.isin(mentioned_names).to_numpy())
+
+    # Directions are relative to the middle of the fleet, "northeast" is both.
+    # Only whole words count, so "least" is not east
+    mentioned_directions = set()
+    for word in words:
+        match = DIRECTION_WORD.fullmatch(word)
+        if match and (match.group(1) or match.group(2)):
+            mentioned_directions.update(direction for direction in match.group(1, 2) if direction)
+    for direction, (column, sign) in DIRECTIONS.items():
+        if direction in mentioned_directions:
+            values = data[column].to_numpy()
+            narrow(sign * (values - np.median(values)) >= 0)
+
+    reasons = {OUTAGE_REASON_WORDS[word] for word in words if word in OUTAGE_REASON_WORDS}
+    if reasons:
+        required = outage_reason_mask(sorted(reasons, key=OUTAGE_REASONS.index))
+        matches = (get_outage_flags(data) & required) == required
+        # Reasons no asset has are ignored rather than leaving nothing to answer from
+        if (matches if mask is None else mask & matches).any():
+            narrow(matches)
+
+    if mask is None:
+        return None
+    return np.flatnonzero(mask)
+
+@traced()
+def build_prompt_context(query, data, k=5, token_budget=1500):
+    """
+    Equipment records for the prompt: the k highest-risk assets matching the
+    question (or of the whole fleet if it names none), cut off once their JSON
+    would exceed token_budget. Returns (records, whether the question narrowed them)
+    """
+    positions = query_equipment_positions(query, data)
+    top = top_equipment_positions(data, k, positions)
+
+    # Only the selected rows are ever converted to Python values
+    columns = {field: data[field].iloc[top].to_numpy() for field in PROMPT_FIELDS}
+    possible_outages = decode_outage_reasons(get_outage_flags(data.iloc[top]))
+    records, used = [], 0
+    for i in range(len(top)):
+        record = {field: cast(columns[field][i]) for field, cast in PROMPT_FIELDS.items()}
+        record["possible_outage"] = possible_outages[i]
+        tokens = len(json.dumps(record, indent=2)) // CHARS_PER_TOKEN + 1
+        if records and used + tokens > token_budget:
+            break
+        records.append(record)
+        used += tokens
+    return records, positions is not None
+
+def normalize_query(query):
+    """Lowercase a question and collapse whitespace and trailing punctuation"""
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+def response_cache_key(query, equipment_list):
+    """
+    Cache key of a question asked about a prompt context. The context records
+    act as the fingerprint of the data, so answers expire with the data they
+    were given rather than with the whole fleet
+    """
+    payload = json.dumps([normalize_query(query), equipment_list], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ResponseCache:
+    """
+    Chatbot responses with LRU and TTL eviction
+    Holds at most max_entries responses in memory and, with cache_dir, one JSON
+    file per key so answers survive restarts. hits and misses count lookups
+    """
+
+    def __init__(self, ttl=3600, max_entries=256, cache_dir=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.store = JsonFileStore(cache_dir) if cache_dir else None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached response for key, or None if missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None and self.store:
+            entry = self.store.read(key)
+        if entry is not None and time.time() - entry['created_at'] > self.ttl:
+            self.delete(key)
+            entry = None
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, entry)
+        return entry['response']
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def set(self, key, response):
+        entry = {'created_at': time.time(), 'response': response}
+        with self.lock:
+            self._remember(key, entry)
+        if self.store:
+            self.store.write(key, entry)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.store:
+            self.store.delete(key)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries)}
+
+def build_prompt(query, equipment_list, matched=False):
+    """Maintenance advisor prompt for a question and its equipment context"""
+    scope = "matching the question" if matched else "in the network"
+    return f"""
         You are a utility maintenance advisor. Based on the provided equipment data, analyze and recommend maintenance priorities.
         The equipment data is sorted by risk score and customer impact.
+        It lists the highest-risk equipment {scope}.
 
         Current query: {query}
 
@@ -41,7 +265,7 @@ def get_chatbot_response(query, equipment_data):
         5. Equipment age
 
         Equipment details (top high-risk items):
-        {json.dumps(equipment_list[:5], indent=2)}
+        {json.dumps(equipment_list, indent=2)}
 
         Provide specific recommendations including:
         1. Which equipment needs immediate attention
@@ -53,25 +277,162 @@ def get_chatbot_response(query, equipment_data):
         At the end of your response, state clearly how many technicians should be deployed (as a number between 1-5).
         """
 
+def parse_recommendation(recommendation):
+    """Response dict for a finished recommendation text"""
+    # Extract the number of technicians needed (look for the last number 1-5 in the text)
+    numbers = re.findall(r'\b[1-5]\b', recommendation)
+    technicians_needed = int(numbers[-1]) if numbers else 2  # Default to 2 if no number found
+
+    return {
+        "recommendation": recommendation,
+        "technicians_needed": technicians_needed
+    }
+
+@traced()
+def get_chatbot_response(query, equipment_data, k=5, token_budget=1500, cache=None, llm_client=None, timeout=CHAT_TIMEOUT):
+    """
+    Get AI response for maintenance queries
+    With a ResponseCache, repeated questions about unchanged equipment are
+    answered from it. llm_client replaces the module's OpenAI client
+    """
+    try:
+        equipment_list, matched = build_prompt_context(query, equipment_data, k, token_budget)
+
+        cache_key = response_cache_key(query, equipment_list) if cache is not None else None
+        if cache_key is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return dict(cached, cached=True)
+
         # Get response from OpenAI
-        response = client.chat.completions.create(
-            model="gpt-4o",  # the newest OpenAI model released May 13, 2024
-            messages=[{"role": "user", "content": prompt}]
+        response = (llm_client or get_client()).chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[{"role": "user", "content": build_prompt(query, equipment_list, matched)}],
+            timeout=timeout
         )
 
         # Get the text response
-        recommendation = response.choices[0].message.content
-
-        # Extract the number of technicians needed (look for the last number 1-5 in the text)
-        import re
-        numbers = re.findall(r'\b[1-5]\b', recommendation)
-        technicians_needed = int(numbers[-1]) if numbers else 2  # Default to 2 if no number found
-
-        return {
-            "recommendation": recommendation,
-            "technicians_needed": technicians_needed
-        }
+        result = parse_recommendation(response.choices[0].message.content)
+        if cache_key is not None:
+            cache.set(cache_key, result)
+        return dict(result, cached=False)
 
     except Exception as e:
         print(f"Error in chatbot response: {str(e)}")  # Add logging
-        raise Exception(f"Error getting chatbot response: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error getting chatbot response: {str(e)}")
+
+class ChatStream:
+    """
+    Text of one chatbot answer as it is generated, readable by any number of
+    callers at once. Completed streams hold the parsed response in result()
+    """
+
+    def __init__(self, cached=None):
+        self.chunks = []
+        self.response = None
+        self.error = None
+        self.done = False
+        self.condition = threading.Condition()
+        if cached is not None:
+            self.chunks.append(cached["recommendation"])
+            self.finish(dict(cached, cached=True))
+
+    def append(self, text):
+        with self.condition:
+            self.chunks.append(text)
+            self.condition.notify_all()
+
+    def finish(self, response=None, error=None):
+        with self.condition:
+            self.response = response
+            self.error = error
+            self.done = True
+            self.condition.notify_all()
+
+    def iter_text(self, timeout=CHAT_TIMEOUT):
+        """
+        Yield the answer chunk by chunk from the start, waiting for new ones
+        Raises TimeoutError if nothing arrives for timeout seconds
+        """
+        i = 0
+        while True:
+            with self.condition:
+                if i == len(self.chunks) and not self.done:
+                    if not self.condition.wait_for(lambda: i < len(self.chunks) or self.done, timeout):
+                        raise TimeoutError("Chatbot response timed out")
+                chunks, done, error = self.chunks[i:], self.done, self.error
+            yield from chunks
+            i += len(chunks)
+            if done and i == len(self.chunks):
+                if error is not None:
+                    raise Exception(f"Error getting chatbot response: {str(error)}")
+                return
+
+    def result(self, timeout=CHAT_TIMEOUT):
+        """Parsed response once the answer is complete"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.done, timeout):
+                raise TimeoutError("Chatbot response timed out")
+        if self.error is not None:
+            raise Exception(f"Error getting chatbot response: {str(self.error)}")
+        return self.response
+
+class ChatExecutor:
+    """
+    Streaming chatbot calls on a bounded worker pool, shared by all sessions
+    At most max_workers completions run at once and at most max_pending wait
+    for a worker. Identical questions about the same context share one
+    in-flight call, and finished answers go to the optional ResponseCache
+    """
+
+    def __init__(self, max_workers=4, max_pending=16, timeout=CHAT_TIMEOUT, cache=None, llm_client=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.llm_client = llm_client
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chatbot")
+        self.lock = threading.Lock()
+        self.in_flight = {}
+
+    @traced()
+    def submit(self, query, equipment_data, k=5, token_budget=1500):
+        """ChatStream answering query, started now or joined if already running"""
+        equipment_list, matched = build_prompt_context(query, equipment_data, k, token_budget)
+        key = response_cache_key(query, equipment_list)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return ChatStream(cached)
+
+        with self.lock:
+            stream = self.in_flight.get(key)
+            if stream is not None:
+                return stream
+            if len(self.in_flight) >= self.max_workers + self.max_pending:
+                raise Exception("Chatbot is busy, please try again shortly")
+            stream = self.in_flight[key] = ChatStream()
+        self.executor.submit(self._run, key, stream, build_prompt(query, equipment_list, matched))
+        return stream
+
+    def _run(self, key, stream, prompt):
+        try:
+            completion = (self.llm_client or get_client()).chat.completions.create(
+                model=CHAT_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                timeout=self.timeout
+            )
+            for chunk in completion:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    stream.append(chunk.choices[0].delta.content)
+            response = parse_recommendation("".join(stream.chunks))
+            if self.cache is not None:
+                self.cache.set(key, response)
+            stream.finish(dict(response, cached=False))
+        except Exception as e:
+            print(f"Error in chatbot response: {str(e)}")  # Add logging
+            stream.finish(error=e)
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
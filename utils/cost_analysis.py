@@ -1,3 +1,15 @@
+import numpy as np
+import pandas as pd
+
+from utils.tracing import traced
+
+BASE_MAINTENANCE_COST = 1000  # Base cost for preventative maintenance
+BASE_REPAIR_COST = 5000       # Base cost for repairs after failure
+COST_PER_CUSTOMER_HOUR = 10   # Cost per customer per hour of outage
+AVERAGE_OUTAGE_HOURS = 4      # Assumed average outage duration
+
+COST_COLUMNS = ['preventative_cost', 'repair_cost', 'savings', 'customer_impact_cost']
+
 def calculate_cost_impact(equipment):
     """
     Calculate cost impact and potential savings
@@ -5,8 +17,8 @@ def calculate_cost_impact(equipment):
     """
     try:
         # Base costs
-        base_maintenance_cost = 1000  # Base cost for preventative maintenance
-        base_repair_cost = 5000      # Base cost for repairs after failure
+        base_maintenance_cost = BASE_MAINTENANCE_COST
+        base_repair_cost = BASE_REPAIR_COST
         
         # Adjust costs based on equipment age
         age_factor = min(equipment['age'] / 10, 2)  # Max 2x cost for old equipment
@@ -34,10 +46,10 @@ def calculate_customer_impact_cost(customer_count):
     """Calculate cost impact based on number of affected customers"""
     try:
         # Base cost per customer per hour of outage
-        cost_per_customer_hour = 10
+        cost_per_customer_hour = COST_PER_CUSTOMER_HOUR
         
         # Assume average outage duration of 4 hours
-        average_outage_duration = 4
+        average_outage_duration = AVERAGE_OUTAGE_HOURS
         
         total_impact = customer_count * cost_per_customer_hour * average_outage_duration
         
@@ -45,3 +57,56 @@ def calculate_customer_impact_cost(customer_count):
         
     except Exception as e:
         raise Exception(f"Error calculating customer impact cost: {str(e)}")
+
+@traced()
+def calculate_cost_impacts(data):
+    """
+    Cost impact of every asset at once, the same figures as calculate_cost_impact
+    plus the customer outage cost. Returns a DataFrame aligned with data
+    """
+    try:
+        age_factor = np.minimum(data['age'].to_numpy(dtype=float) / 10, 2)
+        customers = data['customer_impact'].to_numpy(dtype=float)
+        customer_factor = 1 + customers / 1000
+
+        preventative_cost = BASE_MAINTENANCE_COST * age_factor
+        repair_cost = BASE_REPAIR_COST * age_factor * customer_factor
+
+        return pd.DataFrame({
+            'preventative_cost': preventative_cost,
+            'repair_cost': repair_cost,
+            'savings': repair_cost - preventative_cost,
+            'customer_impact_cost': customers * COST_PER_CUSTOMER_HOUR * AVERAGE_OUTAGE_HOURS,
+        }, index=data.index)
+
+    except Exception as e:
+        raise Exception(f"Error calculating cost impacts: {str(e)}")
+
+def cost_grid_cells(data, cell_size=0.1):
+    """South-west corner (cell_lat, cell_lon) of the grid cell of every asset"""
+    cell_lat = np.floor(data['latitude'].to_numpy(dtype=float) / cell_size) * cell_size
+    cell_lon = np.floor(data['longitude'].to_numpy(dtype=float) / cell_size) * cell_size
+    return pd.DataFrame({'cell_lat': cell_lat.round(6), 'cell_lon': cell_lon.round(6)}, index=data.index)
+
+@traced()
+def summarize_costs(data, costs, by=None):
+    """
+    Fleet cost rollup from calculate_cost_impacts output, in total or grouped by
+    one or more columns of data (or extra Series aligned with it)
+    Each row has the asset count, the summed costs and, when data is scored,
+    expected_repair_cost, the repair cost weighted by risk score
+    """
+    try:
+        totals = costs[COST_COLUMNS].copy()
+        totals.insert(0, 'assets', 1)
+        if 'risk_score' in data.columns:
+            totals['expected_repair_cost'] = costs['repair_cost'].to_numpy() * data['risk_score'].to_numpy(dtype=float)
+
+        if by is None:
+            return totals.sum()
+
+        keys = [data[key] if isinstance(key, str) else key for key in (by if isinstance(by, list) else [by])]
+        return totals.groupby(keys, observed=True, sort=True).sum()
+
+    except Exception as e:
+        raise Exception(f"Error summarizing costs: {str(e)}")
@@ -1,35 +1,298 @@
+import os
+import sys
+import time
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
-def load_and_process_data(data):
-    """Process and validate equipment data"""
+from utils.tracing import traced
+
+REQUIRED_COLUMNS = [
+    'product_id', 'product_name', 'latitude', 'longitude',
+    'installation_date', 'last_maintenance_date', 'temperature',
+    'precipitation_forecast', 'vegetation_proximity', 'customer_impact'
+]
+
+@traced()
+def load_and_process_data(data, reference_date=None):
+    """
+    Process and validate equipment data
+    Age and days since maintenance are measured from reference_date (default now),
+    pass the same date to every chunk of a registry so they stay consistent
+    """
     try:
         # Ensure required columns exist
-        required_columns = [
-            'product_id', 'product_name', 'latitude', 'longitude',
-            'installation_date', 'last_maintenance_date', 'temperature',
-            'precipitation_forecast', 'vegetation_proximity', 'customer_impact'
-        ]
-        
-        for col in required_columns:
+        for col in REQUIRED_COLUMNS:
             if col not in data.columns:
                 raise ValueError(f"Missing required column: {col}")
         
         # Convert dates to datetime
         data['installation_date'] = pd.to_datetime(data['installation_date'])
         data['last_maintenance_date'] = pd.to_datetime(data['last_maintenance_date'])
+
+        now = pd.Timestamp(reference_date if reference_date is not None else datetime.now())
         
         # Calculate equipment age in years
-        data['age'] = (datetime.now() - data['installation_date']).dt.days / 365
+        data['age'] = (now - data['installation_date']).dt.days / 365
         
         # Calculate days since last maintenance
-        data['days_since_maintenance'] = (datetime.now() - data['last_maintenance_date']).dt.days
+        data['days_since_maintenance'] = (now - data['last_maintenance_date']).dt.days
         
         return data
         
     except Exception as e:
         raise Exception(f"Error processing data: {str(e)}")
 
+# Memory-optimized fleet schema. Categorical ids and names hold each string once
+# and store int codes per row, so slices of the fleet only copy the codes
+FLEET_DTYPES = {
+    'product_id': 'category',
+    'product_name': 'category',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'temperature': 'float32',
+    'precipitation_forecast': 'float32',
+    'vegetation_proximity': 'bool',
+    'customer_impact': 'int32',
+    'age': 'float32',
+    'days_since_maintenance': 'int16',
+    'risk_score': 'float32',
+    'risk_level': 'category',
+    'outage_flags': 'uint8',
+}
+
+def compact_dtypes(data):
+    """
+    Convert equipment data to the compact fleet schema in place
+    Columns outside FLEET_DTYPES are downcast to float32 or the smallest int type
+    """
+    for col in data.columns:
+        if col in FLEET_DTYPES:
+            if data[col].dtype != FLEET_DTYPES[col]:
+                data[col] = data[col].astype(FLEET_DTYPES[col])
+        elif pd.api.types.is_float_dtype(data[col]):
+            data[col] = data[col].astype(np.float32)
+        elif pd.api.types.is_integer_dtype(data[col]):
+            data[col] = pd.to_numeric(data[col], downcast='integer')
+    return data
+
+# Possible outage reasons in display order, bit i of outage_flags is reason i
+OUTAGE_REASONS = [
+    "Equipment Age",
+    "Maintenance Overdue",
+    "Vegetation Proximity",
+    "High Temperature",
+    "Heavy Precipitation",
+]
+
+def outage_reason_flags(data):
+    """
+    Bitmask of the possible outage reasons of every row, as uint8. Only depends
+    on the dataset, so the fleet store keeps it as the outage_flags column
+    """
+    conditions = [
+        data['age'].to_numpy() > 15,
+        data['days_since_maintenance'].to_numpy() > 180,
+        data['vegetation_proximity'].to_numpy(dtype=bool),
+        data['temperature'].to_numpy() > 85,
+        data['precipitation_forecast'].to_numpy() > 30,
+    ]
+    flags = np.zeros(len(data), dtype=np.uint8)
+    for bit, condition in enumerate(conditions):
+        flags |= condition.astype(np.uint8) << bit
+    return flags
+
+def get_outage_flags(data):
+    """The outage_flags column when data has one, computed otherwise"""
+    if 'outage_flags' in data.columns:
+        return data['outage_flags'].to_numpy()
+    return outage_reason_flags(data)
+
+def outage_reason_mask(reasons):
+    """Bitmask of a list of OUTAGE_REASONS names"""
+    mask = 0
+    for reason in reasons:
+        mask |= 1 << OUTAGE_REASONS.index(reason)
+    return mask
+
+# Every combination of reasons is rendered once and looked up by flags
+_OUTAGE_REASON_TEXT = np.array([
+    " & ".join(reason for bit, reason in enumerate(OUTAGE_REASONS) if flags & (1 << bit)) or "No immediate risks"
+    for flags in range(1 << len(OUTAGE_REASONS))
+], dtype=object)
+
+def decode_outage_reasons(flags):
+    """Display text of outage flags, an array for an array and a str for one value"""
+    text = _OUTAGE_REASON_TEXT[np.asarray(flags, dtype=np.intp)]
+    return text if isinstance(text, np.ndarray) else str(text)
+
+@traced()
+def filter_equipment(data, positions=None, product_names=None, risk_levels=None, outage_reasons=None):
+    """
+    Row positions of equipment matching every given filter, for use with data.iloc
+    positions restricts the result to an earlier selection such as search results,
+    outage_reasons keeps equipment with all of the given reasons.
+    Returns None when no filter applies, meaning all rows, so nothing is copied
+    """
+    if positions is None and not product_names and not risk_levels and not outage_reasons:
+        return None
+
+    mask = np.ones(len(data), dtype=bool)
+    if product_names:
+        mask &= data['product_name'].isin(product_names).to_numpy()
+    if risk_levels:
+        mask &= data['risk_level'].isin(risk_levels).to_numpy()
+    if outage_reasons:
+        required = outage_reason_mask(outage_reasons)
+        mask &= (get_outage_flags(data) & required) == required
+
+    if positions is None:
+        return np.flatnonzero(mask)
+    return positions[mask[positions]]
+
+# Columns the equipment table can be sorted by, with their labels
+TABLE_SORT_COLUMNS = {
+    'risk_score': "Risk score",
+    'customer_impact': "Customer impact",
+    'age': "Age",
+    'days_since_maintenance': "Days since maintenance",
+}
+
+def sort_order(values):
+    """Row positions ordering values ascending, ties kept in row order"""
+    return np.argsort(np.asarray(values), kind='stable')
+
+@traced()
+def page_positions(order, values, positions=None, page=1, page_size=50, descending=True):
+    """
+    Row positions of one table page and the number of rows across all pages
+    order is sort_order(values) over the whole fleet; positions restricts the
+    rows as filter_equipment does. Without a filter only the page is sliced
+    from order, a small filter is sorted directly and a large one is taken
+    from order with a mask, so nothing is ever re-sorted per page
+    """
+    if positions is None:
+        total = len(order)
+        ordered = order
+    else:
+        total = len(positions)
+        if total * np.log2(max(total, 2)) < len(order):
+            ordered = positions[sort_order(np.asarray(values)[positions])]
+        else:
+            selected = np.zeros(len(order), dtype=bool)
+            selected[positions] = True
+            ordered = order[selected[order]]
+
+    start = (page - 1) * page_size
+    if descending:
+        # Reverse from the end so the slice never copies the whole order
+        stop = total - start
+        return ordered[max(stop - page_size, 0):max(stop, 0)][::-1], total
+    return ordered[start:start + page_size], total
+
+def validate_registry_columns(columns, path):
+    """Raise if a registry schema lacks any required column"""
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing:
+        raise ValueError(f"Missing required columns in {path}: {', '.join(missing)}")
+
+def _iter_parquet_chunks(path, columns, chunksize):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    validate_registry_columns(parquet_file.schema_arrow.names, path)
+    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+        yield batch.to_pandas()
+
+def _iter_arrow_chunks(path, columns, chunksize):
+    import pyarrow as pa
+
+    # Memory-mapped IPC files are read without copying record batches into the heap
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        validate_registry_columns(reader.schema.names, path)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i).select(columns)
+            for offset in range(0, batch.num_rows, chunksize):
+                yield batch.slice(offset, chunksize).to_pandas()
+
+def _iter_csv_chunks(path, columns, chunksize):
+    validate_registry_columns(pd.read_csv(path, nrows=0).columns, path)
+    yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+REGISTRY_READERS = {
+    '.parquet': _iter_parquet_chunks,
+    '.pq': _iter_parquet_chunks,
+    '.arrow': _iter_arrow_chunks,
+    '.feather': _iter_arrow_chunks,
+    '.ipc': _iter_arrow_chunks,
+    '.csv': _iter_csv_chunks,
+}
+
+def iter_registry_chunks(path, columns=None, chunksize=250_000, reference_date=None):
+    """
+    Stream a Parquet, Arrow IPC/Feather or CSV equipment registry as processed chunks
+    Required columns are validated from the file schema before any rows are read,
+    and only the requested columns (required ones by default) are loaded
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in REGISTRY_READERS:
+        raise ValueError(f"Unsupported registry format: {extension}")
+
+    columns = list(dict.fromkeys(REQUIRED_COLUMNS + list(columns or [])))
+    reference_date = reference_date if reference_date is not None else datetime.now()
+    for chunk in REGISTRY_READERS[extension](path, columns, chunksize):
+        yield compact_dtypes(load_and_process_data(chunk, reference_date))
+
+def peak_memory_mb():
+    """
+    Peak memory of this process so far: the resident set size, which includes
+    Arrow's allocator, and the peak of Arrow's default memory pool, in MiB
+    """
+    import resource
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    memory = {'peak_rss_mb': max_rss / 2 ** 20 if sys.platform == 'darwin' else max_rss / 2 ** 10}
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return memory
+    memory['arrow_peak_mb'] = pa.default_memory_pool().max_memory() / 2 ** 20
+    return memory
+
+@traced()
+def load_equipment_registry(path, columns=None, chunksize=250_000, reference_date=None, track_memory=False):
+    """
+    Load and process an equipment registry file chunk by chunk
+    Returns (data, stats) where stats reports rows, load time and, with
+    track_memory, the process's peak resident and Arrow pool memory
+    """
+    try:
+        start = time.perf_counter()
+
+        chunks = list(iter_registry_chunks(path, columns, chunksize, reference_date))
+        if chunks:
+            data = pd.concat(chunks, ignore_index=True)
+        else:
+            data = pd.DataFrame(columns=REQUIRED_COLUMNS + ['age', 'days_since_maintenance'])
+        # Concatenating differing category sets falls back to object, restore it
+        data = compact_dtypes(data)
+
+        stats = {
+            'rows': len(data),
+            'chunks': len(chunks),
+            'load_seconds': time.perf_counter() - start,
+            'memory_mb': float(data.memory_usage(deep=True).sum()) / 2 ** 20,
+        }
+        if track_memory:
+            stats.update(peak_memory_mb())
+
+        return data, stats
+
+    except Exception as e:
+        raise Exception(f"Error loading equipment registry: {str(e)}")
+
 def validate_equipment_data(equipment):
     """Validate single equipment entry"""
     if not isinstance(equipment, pd.Series):
@@ -0,0 +1,172 @@
+import heapq
+import threading
+import numpy as np
+import pandas as pd
+
+from utils.asset_index import haversine_km
+from utils.cost_analysis import calculate_cost_impacts
+from utils.tracing import traced
+
+# Crew-hours and technicians a preventative job takes, per product type
+JOB_HOURS = {'Transformer': 6.0, 'Switch Gear': 4.0, 'Circuit Breaker': 3.0, 'Power Pole': 2.0}
+JOB_TECHNICIANS = {'Transformer': 4, 'Switch Gear': 3, 'Circuit Breaker': 2, 'Power Pole': 2}
+DEFAULT_JOB_HOURS = 3.0
+DEFAULT_JOB_TECHNICIANS = 2
+
+SHIFT_HOURS = 8.0
+TRAVEL_KMH = 40.0
+# Travel assumed per job when ranking assets, before routes are known
+TRAVEL_ALLOWANCE_HOURS = 0.5
+# A pool that runs dry is doubled up to this many times the hours being planned
+MAX_POOL_GROWTH = 16
+
+def crew_sizes(crews, technicians):
+    """Technicians per crew, spread as evenly as possible"""
+    if crews <= 0:
+        return np.zeros(0, dtype=np.int64)
+    sizes = np.full(crews, technicians // crews, dtype=np.int64)
+    sizes[:technicians % crews] += 1
+    return sizes
+
+class DispatchPlanner:
+    """
+    Plans which assets the available crews maintain today, and in what order
+    Every asset is worth its expected avoided cost, risk score times repair
+    cost minus the preventative cost, per crew-hour of work plus travel.
+    Only a pool of the highest-value assets, a few times more than the crews
+    could ever reach, is kept ranked, so planning does not scan the fleet and
+    set_risk only re-ranks the assets whose score changed. costs may pass in
+    calculate_cost_impacts(data) when it is already at hand
+    """
+
+    def __init__(self, data, risk_scores=None, costs=None, pool_factor=4):
+        self.size = len(data)
+        self.pool_factor = pool_factor
+        self.product_ids = data['product_id']
+        names = data['product_name'].astype(str)
+        self.job_hours = names.map(JOB_HOURS).fillna(DEFAULT_JOB_HOURS).to_numpy(dtype=float)
+        self.job_technicians = names.map(JOB_TECHNICIANS).fillna(DEFAULT_JOB_TECHNICIANS).to_numpy(dtype=np.int64)
+        self.latitude = data['latitude'].to_numpy(dtype=float)
+        self.longitude = data['longitude'].to_numpy(dtype=float)
+        self.depot = (float(np.median(self.latitude)), float(np.median(self.longitude))) if self.size else (0.0, 0.0)
+
+        if costs is None:
+            costs = calculate_cost_impacts(data)
+        self.repair_cost = costs['repair_cost'].to_numpy(dtype=float)
+        self.preventative_cost = costs['preventative_cost'].to_numpy(dtype=float)
+
+        self.lock = threading.Lock()
+        self.risk = np.zeros(self.size)
+        self.density = np.full(self.size, -np.inf)
+        self.pool = np.zeros(self.size, dtype=bool)
+        self.pool_positions = np.zeros(0, dtype=np.int64)
+        self.pool_floor = np.inf
+        self.pool_capacity = 0.0
+        # Largest capacity planned for, the pool's size before any growth
+        self.plan_capacity = 0.0
+        if risk_scores is not None:
+            self.set_risk(risk_scores)
+
+    def _update_density(self, positions):
+        """Avoided cost per crew-hour of positions, -inf where not worth a visit"""
+        avoided = self.risk[positions] * self.repair_cost[positions] - self.preventative_cost[positions]
+        density = avoided / (self.job_hours[positions] + TRAVEL_ALLOWANCE_HOURS)
+        self.density[positions] = np.where(avoided > 0, density, -np.inf)
+
+    def _build_pool(self, capacity_hours):
+        """Rank the assets that a plan of capacity_hours could possibly reach"""
+        max_jobs = int(np.ceil(capacity_hours / (self.job_hours.min() + TRAVEL_ALLOWANCE_HOURS))) if self.size else 0
+        pool_size = min(self.size, max(self.pool_factor * max_jobs, 1))
+        if pool_size < self.size:
+            positions = np.argpartition(-self.density, pool_size - 1)[:pool_size]
+        else:
+            positions = np.arange(self.size)
+        positions = positions[np.isfinite(self.density[positions])]
+        self.pool[:] = False
+        self.pool[positions] = True
+        self.pool_positions = positions
+        # Assets outside the pool are worth at most the floor
+        self.pool_floor = self.density[positions].min() if pool_size < self.size and len(positions) else -np.inf
+        self.pool_capacity = capacity_hours
+
+    @traced()
+    def set_risk(self, risk_scores):
+        """
+        Take a new risk score for every asset. Only the assets whose score
+        changed are re-ranked, the pool is rebuilt at its planned size when
+        most of them did or when a plan had to grow it
+        Returns the number of assets that changed
+        """
+        risk_scores = np.asarray(risk_scores, dtype=float)
+        with self.lock:
+            changed = np.flatnonzero(risk_scores != self.risk)
+            self.risk[changed] = risk_scores[changed]
+            self._update_density(changed)
+            grown = self.pool_capacity > self.plan_capacity
+            if len(changed) > self.size // 10 or (len(changed) and grown):
+                if self.plan_capacity:
+                    self._build_pool(self.plan_capacity)
+            elif len(changed):
+                # Assets now worth more than the floor join the pool
+                joining = changed[(self.density[changed] > self.pool_floor) & ~self.pool[changed]]
+                self.pool[joining] = True
+                self.pool_positions = np.concatenate([self.pool_positions, joining])
+        return len(changed)
+
+    @traced()
+    def plan(self, crews, technicians, shift_hours=SHIFT_HOURS):
+        """
+        Greedy dispatch of crews: assets are taken in order of avoided cost per
+        crew-hour and given to the nearest crew large enough for the job with
+        time left in its shift, skipping assets no crew can fit
+        Returns one row per stop in visiting order for every crew
+        """
+        sizes = crew_sizes(crews, technicians)
+        capacity_hours = len(sizes) * shift_hours
+        with self.lock:
+            if capacity_hours > self.pool_capacity:
+                self._build_pool(capacity_hours)
+            self.plan_capacity = max(self.plan_capacity, capacity_hours)
+            stops, exhausted = self._assign(sizes, shift_hours, self.pool_positions)
+            # A pool that ran dry before the shifts filled may have cut off reachable
+            # assets, so it is doubled until the plan fills, it holds every asset
+            # worth a visit or it reaches MAX_POOL_GROWTH times the planned hours
+            max_capacity = MAX_POOL_GROWTH * capacity_hours
+            while exhausted and np.isfinite(self.pool_floor) and self.pool_capacity < max_capacity:
+                self._build_pool(min(2 * self.pool_capacity, max_capacity))
+                stops, exhausted = self._assign(sizes, shift_hours, self.pool_positions)
+
+        plan = pd.DataFrame(stops, columns=[
+            'crew', 'stop', 'position', 'job_hours', 'travel_hours', 'risk_score', 'expected_avoided_cost'
+        ])
+        plan.insert(3, 'product_id', self.product_ids.iloc[plan['position']].to_numpy())
+        return plan
+
+    def _assign(self, sizes, shift_hours, positions):
+        """Stops of the greedy plan over positions, and whether time was left when they ran out"""
+        remaining = np.full(len(sizes), shift_hours)
+        locations = np.tile(self.depot, (len(sizes), 1))
+        stop_counts = np.zeros(len(sizes), dtype=np.int64)
+        shortest_job = self.job_hours.min() if self.size else 0.0
+
+        heap = [(-self.density[position], position) for position in positions.tolist()]
+        heapq.heapify(heap)
+        stops = []
+        while heap and (remaining >= shortest_job).any():
+            _, position = heapq.heappop(heap)
+            travel = haversine_km(
+                self.latitude[position], self.longitude[position], locations[:, 0], locations[:, 1]
+            ) / TRAVEL_KMH
+            fits = (sizes >= self.job_technicians[position]) & (remaining >= travel + self.job_hours[position])
+            if not fits.any():
+                continue
+            crew = int(np.argmin(np.where(fits, travel, np.inf)))
+            remaining[crew] -= travel[crew] + self.job_hours[position]
+            locations[crew] = self.latitude[position], self.longitude[position]
+            stop_counts[crew] += 1
+            stops.append((
+                crew + 1, int(stop_counts[crew]), position, self.job_hours[position], travel[crew],
+                self.risk[position], self.risk[position] * self.repair_cost[position] - self.preventative_cost[position]
+            ))
+        exhausted = not heap and bool((remaining >= shortest_job).any())
+        return sorted(stops), exhausted
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from utils.asset_index import AssetIndex
+from utils.search_index import SearchIndex
+from utils.predictions import calculate_risk_scores, get_risk_levels
+from utils.data_processing import outage_reason_flags
+from utils.tracing import traced
+
+def read_only_column(column):
+    """
+    Read-only copy of a column, so a session writing to a frame that shares it
+    gets an error instead of changing it for every session (pandas before 3
+    writes straight through to shared arrays). Categoricals keep read-only
+    codes, other extension types are kept as they are
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = np.array(column.cat.codes, copy=True)
+        codes.flags.writeable = False
+        return pd.Categorical.from_codes(codes, dtype=column.dtype)
+    if isinstance(column.dtype, np.dtype):
+        values = np.array(column, copy=True)
+        values.flags.writeable = False
+        return values
+    return column
+
+def weather_key(weather_data):
+    """Hashable identity of a weather reading, used to share scored frames"""
+    if not weather_data:
+        return None
+    return tuple(sorted((key, str(value)) for key, value in weather_data.items()))
+
+class FleetSnapshot:
+    """
+    One immutable version of the fleet with the structures derived from it
+    data is shared by every session in the process, so its columns are made
+    read-only when the snapshot is built
+    """
+
+    def __init__(self, data, version, source_fingerprint=None):
+        columns = {col: read_only_column(data[col]) for col in data.columns}
+        # Outage reasons only depend on the dataset, so they are flagged once here
+        if 'outage_flags' not in columns:
+            columns['outage_flags'] = read_only_column(pd.Series(outage_reason_flags(data), index=data.index))
+        data = pd.DataFrame(columns, index=data.index, copy=False)
+        self.data = data
+        self.version = version
+        self.source_fingerprint = source_fingerprint
+        self.loaded_at = time.time()
+        self.asset_index = AssetIndex(data)
+        self.search_index = SearchIndex(data)
+
+        self._lock = threading.Lock()
+        self._derived = {}
+        self._scored = OrderedDict()
+        self._scored_derived = {}
+
+    def derived(self, key, compute):
+        """
+        Compute a value from this snapshot once and share it, e.g. rollups or indexes
+        Values live as long as the snapshot, so keys must not grow without bound
+        """
+        if key not in self._derived:
+            with self._lock:
+                if key not in self._derived:
+                    self._derived[key] = compute(self)
+        return self._derived[key]
+
+    @traced()
+    def scored(self, weather_data=None, weather_risk=None, keep=2):
+        """
+        The fleet with risk_score and risk_level for a weather reading, or for a
+        per-asset weather risk array. Frames share every other column with data
+        and the last `keep` readings stay cached, so sessions on the same
+        reading never rescore the fleet. Every caller gets its own shallow copy,
+        so writing to it raises (or copies, from pandas 3) instead of changing
+        the cached frame
+        """
+        key = self._score_key(weather_data, weather_risk)
+        with self._lock:
+            if key in self._scored:
+                self._scored.move_to_end(key)
+                return self._scored[key].copy(deep=False)
+
+        risk_scores = calculate_risk_scores(self.data, weather_data, weather_risk)
+        columns = {col: self.data[col] for col in self.data.columns}
+        columns['risk_score'] = read_only_column(risk_scores.astype(np.float32))
+        columns['risk_level'] = read_only_column(get_risk_levels(risk_scores).astype('category'))
+        scored = pd.DataFrame(columns, copy=False)
+
+        with self._lock:
+            scored = self._scored.setdefault(key, scored)
+            while len(self._scored) > keep:
+                evicted, _ = self._scored.popitem(last=False)
+                for derived_key in [k for k in self._scored_derived if k[0] == evicted]:
+                    del self._scored_derived[derived_key]
+        return scored.copy(deep=False)
+
+    def scored_derived(self, key, compute, weather_data=None, weather_risk=None, cache_if=None):
+        """
+        Like derived, for values that depend on risk scores: compute receives the
+        scored frame for the reading and the value is shared for as long as that
+        frame stays cached. With cache_if, values it rejects are not kept and
+        are computed again on the next call
+        """
+        score_key = self._score_key(weather_data, weather_risk)
+        scored = self.scored(weather_data, weather_risk)
+        with self._lock:
+            if (score_key, key) in self._scored_derived:
+                return self._scored_derived[(score_key, key)]
+        value = compute(scored)
+        if cache_if is not None and not cache_if(value):
+            return value
+        with self._lock:
+            if score_key in self._scored:
+                value = self._scored_derived.setdefault((score_key, key), value)
+        return value
+
+    @staticmethod
+    def _score_key(weather_data, weather_risk):
+        if weather_risk is not None:
+            return ('per_asset', hash(np.asarray(weather_risk).tobytes()))
+        return weather_key(weather_data)
+
+class FleetStore:
+    """
+    Process-wide holder of the current FleetSnapshot
+    loader() builds the fleet DataFrame and fingerprint() returns a cheap token
+    of the source version (None when the source never changes). The source is
+    checked at most every check_interval seconds; a changed source is loaded in
+    a background thread into a new snapshot, which then replaces the old one in
+    a single assignment. Callers keep getting the previous snapshot meanwhile
+    """
+
+    def __init__(self, loader, fingerprint=None, check_interval=60):
+        self.loader = loader
+        self.fingerprint = fingerprint
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._last_check = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _load(self, source_fingerprint):
+        self._version += 1
+        self._snapshot = FleetSnapshot(self.loader(), self._version, source_fingerprint)
+
+    def get(self):
+        """Current snapshot, loading it first if needed"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._last_check = time.time()
+                    self._load(self.fingerprint() if self.fingerprint else None)
+            return self._snapshot
+
+        # Fingerprints are cheap, the reload itself runs in the background
+        if self.fingerprint and time.time() - self._last_check > self.check_interval:
+            self._last_check = time.time()
+            if self.fingerprint() != snapshot.source_fingerprint and not self._lock.locked():
+                threading.Thread(target=self.refresh, kwargs={'blocking': False}, daemon=True).start()
+        return self._snapshot
+
+    def refresh(self, blocking=True):
+        """
+        Reload if the source fingerprint changed. Returns True if a new snapshot
+        was installed; without blocking, gives up when another reload is running
+        """
+        if not self._lock.acquire(blocking=blocking):
+            return False
+        try:
+            self._last_check = time.time()
+            source_fingerprint = self.fingerprint() if self.fingerprint else None
+            if self._snapshot is not None and source_fingerprint == self._snapshot.source_fingerprint:
+                return False
+            self._load(source_fingerprint)
+            return True
+        finally:
+            self._lock.release()
+
+def file_fingerprint(path):
+    """Fingerprint of a registry file that changes whenever it is rewritten"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,41 @@
+import os
+import json
+import threading
+
+class JsonFileStore:
+    """
+    One JSON file per key in a directory, shared by the on-disk caches
+    Writes go to a temporary file that is then renamed, so readers in this or
+    another process never see a partial entry
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def read(self, key):
+        """Entry stored under key, or None if missing or unreadable"""
+        try:
+            with open(self.path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, key, entry):
+        tmp_path = f"{self.path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self.path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def keys(self):
+        """Keys of every entry on disk"""
+        return [name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json")]
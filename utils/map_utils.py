@@ -1,66 +1,355 @@
+import json
 import folium
-from branca.element import Figure
+import numpy as np
+import pandas as pd
+from branca.element import Element, Figure, MacroElement
+from jinja2 import Template
 
-def create_equipment_map(data):
-    """Create folium map with equipment markers"""
+from utils.data_processing import decode_outage_reasons, get_outage_flags
+from utils.tracing import annotate, traced
+
+# Level of detail: individual assets are drawn from this zoom level up, as long
+# as no more than LOD_MAX_POINTS are visible; otherwise grid cells of about
+# LOD_CELL_PIXELS on screen are drawn instead
+LOD_MIN_ZOOM = 14
+LOD_MAX_POINTS = 5000
+LOD_CELL_PIXELS = 48
+
+# Largest fleets drawn one folium.Marker or one GeoJSON feature per asset. Past
+# these the page takes seconds to build and tens of MB to send, level of detail does not
+MARKERS_MAX_ASSETS = 1_000
+GEOJSON_MAX_ASSETS = 100_000
+
+# Assumed on-screen size of the map, used to work out the view before st_folium
+# has reported its bounds. The width is generous for a half-page column
+MAP_WIDTH_PIXELS = 1000
+MAP_HEIGHT_PIXELS = 600
+
+def get_risk_colors(risk_scores):
+    """Map an array of risk scores to marker colors"""
+    risk_scores = np.asarray(risk_scores)
+    return np.select(
+        [risk_scores < 0.3, risk_scores < 0.5, risk_scores < 0.7],
+        ['green', 'yellow', 'orange'],
+        default='red'
+    )
+
+def get_outage_reasons(data):
+    """Possible outage reason text for every row, from its outage flags"""
+    return decode_outage_reasons(get_outage_flags(data))
+
+@traced()
+def map_modes(n_assets):
+    """Map modes that stay responsive for a fleet of n_assets, the recommended one first"""
+    modes = ["lod"]
+    if n_assets <= GEOJSON_MAX_ASSETS:
+        modes.append("geojson")
+    if n_assets <= MARKERS_MAX_ASSETS:
+        modes.append("markers")
+    return modes
+
+def create_equipment_map(data, mode="lod", center=None, zoom=None, bounds=None):
+    """
+    Create folium map with equipment markers
+    mode="markers" adds one folium.Marker per asset, mode="geojson" emits all
+    assets as a single GeoJSON layer drawn on canvas and mode="lod" only sends
+    what the current view (center, zoom, bounds) needs. Modes map_modes does
+    not offer for the fleet's size are refused
+    """
+    if mode in ("markers", "geojson") and mode not in map_modes(len(data)):
+        raise ValueError(f"Map mode {mode} is too slow for {len(data):,} assets, use lod")
     try:
-        # Calculate map center
-        center_lat = data['latitude'].mean()
-        center_lon = data['longitude'].mean()
+        # Calculate map center, keeping the current view when one is known
+        if center is None:
+            center = [data['latitude'].mean(), data['longitude'].mean()]
+        if zoom is None:
+            zoom = 12
 
         # Create base map
         m = folium.Map(
-            location=[center_lat, center_lon],
-            zoom_start=12,
-            tiles='OpenStreetMap'
+            location=center,
+            zoom_start=zoom,
+            tiles='OpenStreetMap',
+            prefer_canvas=(mode != "markers")
         )
 
-        # Add markers for each equipment
-        for _, equipment in data.iterrows():
-            # Determine marker color based on risk score
-            if equipment['risk_score'] < 0.3:
-                color = 'green'
-            elif equipment['risk_score'] < 0.5:
-                color = 'yellow'
-            elif equipment['risk_score'] < 0.7:
-                color = 'orange'
-            else:
-                color = 'red'
-
-            # Determine possible outage reason
-            reasons = []
-            if equipment['age'] > 15:
-                reasons.append("Equipment Age")
-            if equipment['days_since_maintenance'] > 180:
-                reasons.append("Maintenance Overdue")
-            if equipment['vegetation_proximity']:
-                reasons.append("Vegetation Proximity")
-            if equipment['temperature'] > 85:
-                reasons.append("High Temperature")
-            if equipment['precipitation_forecast'] > 30:
-                reasons.append("Heavy Precipitation")
-
-            outage_reason = " & ".join(reasons) if reasons else "No immediate risks"
-
-            # Create popup content with HTML
-            popup_content = f"""
-            <div style='font-family: Arial, sans-serif; min-width: 200px;'>
-                <strong style='font-size: 16px;'>{equipment['product_name']}</strong><br>
-                <hr style='margin: 5px 0;'>
-                <strong>Risk Score:</strong> {equipment['risk_score']:.2f}<br>
-                <strong>Possible Outage:</strong> {outage_reason}<br>
-                <strong>Customers Impacted:</strong> {equipment['customer_impact']:,}
-            </div>
-            """
-
-            # Add marker
-            folium.Marker(
-                location=[equipment['latitude'], equipment['longitude']],
-                popup=popup_content,
-                icon=folium.Icon(color=color, icon='info-sign'),
-            ).add_to(m)
+        if mode == "lod":
+            add_level_of_detail_layer(m, data, zoom, bounds, center)
+        elif mode == "geojson":
+            add_geojson_layer(m, data)
+        elif mode == "markers":
+            add_marker_layer(m, data)
+        else:
+            raise ValueError(f"Unknown map mode: {mode}")
 
         return m
 
     except Exception as e:
-        raise Exception(f"Error creating map: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error creating map: {str(e)}")
+
+def add_marker_layer(m, data):
+    """Add an individual folium.Marker with an HTML popup for each equipment"""
+    colors = get_risk_colors(data['risk_score'])
+    reasons = get_outage_reasons(data)
+    annotate(markers=len(data))
+
+    for (_, equipment), color, outage_reason in zip(data.iterrows(), colors, reasons):
+        # Create popup content with HTML
+        popup_content = f"""
+        <div style='font-family: Arial, sans-serif; min-width: 200px;'>
+            <strong style='font-size: 16px;'>{equipment['product_name']}</strong><br>
+            <hr style='margin: 5px 0;'>
+            <strong>Risk Score:</strong> {equipment['risk_score']:.2f}<br>
+            <strong>Possible Outage:</strong> {outage_reason}<br>
+            <strong>Customers Impacted:</strong> {equipment['customer_impact']:,}
+        </div>
+        """
+
+        # Add marker
+        folium.Marker(
+            location=[equipment['latitude'], equipment['longitude']],
+            popup=popup_content,
+            icon=folium.Icon(color=color, icon='info-sign'),
+        ).add_to(m)
+
+def build_equipment_geojson(data):
+    """Build a GeoJSON FeatureCollection of equipment points with popup fields"""
+    colors = get_risk_colors(data['risk_score'])
+    reasons = get_outage_reasons(data)
+
+    # Convert each column once so the feature loop only zips plain Python values
+    columns = zip(
+        np.round(data['longitude'].to_numpy(dtype=float), 6).tolist(),
+        np.round(data['latitude'].to_numpy(dtype=float), 6).tolist(),
+        data['product_id'].astype(str).tolist(),
+        data['product_name'].astype(str).tolist(),
+        np.round(data['risk_score'].to_numpy(dtype=float), 2).tolist(),
+        reasons.tolist(),
+        data['customer_impact'].to_numpy(dtype=np.int64).tolist(),
+        colors.tolist(),
+    )
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {
+                "product_id": product_id,
+                "product_name": product_name,
+                "risk_score": risk_score,
+                "outage_reason": reason,
+                "customer_impact": customers,
+                "color": color,
+            },
+        }
+        for lon, lat, product_id, product_name, risk_score, reason, customers, color in columns
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+class RawScript(Element):
+    """Script element emitted verbatim instead of being compiled as a template"""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = script
+
+    def render(self, **kwargs):
+        return self.script
+
+class VerbatimGeoJson(MacroElement):
+    """
+    GeoJSON layer whose rendered script is emitted verbatim, so the large
+    feature payload is never compiled as a template
+    """
+
+    def __init__(self, geojson):
+        super().__init__()
+        # Escape "</" so asset names cannot terminate the surrounding script tag
+        self.payload = json.dumps(geojson, separators=(',', ':')).replace('</', '<\\/')
+        annotate(features=len(geojson['features']), payload_bytes=len(self.payload))
+
+    def render(self, **kwargs):
+        self.get_root().script.add_child(
+            RawScript(self._template.module.script(self, kwargs)),
+            name=self.get_name()
+        )
+
+class EquipmentGeoJson(VerbatimGeoJson):
+    """Single layer of circle markers for all equipment, popups are built when opened"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = L.geoJson(null, {
+            pointToLayer: function(feature, latlng) {
+                var color = feature.properties.color;
+                return L.circleMarker(latlng, {
+                    radius: 6, weight: 1, color: color, fillColor: color, fillOpacity: 0.8
+                });
+            },
+            onEachFeature: function(feature, layer) {
+                layer.bindPopup(function() {
+                    var p = feature.properties;
+                    return "<div style='font-family: Arial, sans-serif; min-width: 200px;'>" +
+                        "<strong style='font-size: 16px;'>" + p.product_name + "</strong><br>" +
+                        "<hr style='margin: 5px 0;'>" +
+                        "<strong>Risk Score:</strong> " + p.risk_score.toFixed(2) + "<br>" +
+                        "<strong>Possible Outage:</strong> " + p.outage_reason + "<br>" +
+                        "<strong>Customers Impacted:</strong> " + p.customer_impact.toLocaleString() +
+                        "</div>";
+                });
+            }
+        }).addTo({{ this._parent.get_name() }});
+        {{ this.get_name() }}.addData({{ this.payload }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, geojson):
+        super().__init__(geojson)
+        self._name = "EquipmentGeoJson"
+
+class EquipmentGridGeoJson(VerbatimGeoJson):
+    """Layer of grid cell rectangles summarizing the equipment inside each cell"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = L.geoJson(null, {
+            style: function(feature) {
+                var color = feature.properties.color;
+                return {color: color, fillColor: color, weight: 1, fillOpacity: 0.45};
+            },
+            onEachFeature: function(feature, layer) {
+                layer.bindPopup(function() {
+                    var p = feature.properties;
+                    return "<div style='font-family: Arial, sans-serif; min-width: 200px;'>" +
+                        "<strong style='font-size: 16px;'>" + p.count.toLocaleString() + " assets</strong><br>" +
+                        "<hr style='margin: 5px 0;'>" +
+                        "<strong>Max Risk Score:</strong> " + p.max_risk.toFixed(2) + "<br>" +
+                        "<strong>Customers Impacted:</strong> " + p.customer_impact.toLocaleString() +
+                        "</div>";
+                });
+            }
+        }).addTo({{ this._parent.get_name() }});
+        {{ this.get_name() }}.addData({{ this.payload }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, geojson):
+        super().__init__(geojson)
+        self._name = "EquipmentGridGeoJson"
+
+def add_geojson_layer(m, data):
+    """Add all equipment to the map as one GeoJSON layer of circle markers"""
+    EquipmentGeoJson(build_equipment_geojson(data)).add_to(m)
+
+def get_bounds_mask(data, bounds, padding=0.25):
+    """
+    Boolean mask of equipment inside map bounds as returned by st_folium
+    The box is padded by a fraction of its size so short pans stay covered
+    """
+    south, west = bounds['_southWest']['lat'], bounds['_southWest']['lng']
+    north, east = bounds['_northEast']['lat'], bounds['_northEast']['lng']
+    lat_pad = (north - south) * padding
+    lon_pad = (east - west) * padding
+
+    latitude = data['latitude'].to_numpy()
+    longitude = data['longitude'].to_numpy()
+    return (
+        (latitude >= south - lat_pad) & (latitude <= north + lat_pad) &
+        (longitude >= west - lon_pad) & (longitude <= east + lon_pad)
+    )
+
+def get_view_bounds(center, zoom, width=MAP_WIDTH_PIXELS, height=MAP_HEIGHT_PIXELS):
+    """
+    Bounds, in the st_folium format, of a width x height pixel Web Mercator view
+    centered on center = [lat, lon] at a zoom level
+    """
+    world_pixels = 256 * 2 ** zoom
+    lat, lon = center
+    half_lon = 180 * width / world_pixels
+    # Latitude is not linear in Mercator, so go through the projected y
+    y = np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    half_y = np.pi * height / world_pixels
+    south = np.degrees(2 * np.arctan(np.exp(y - half_y)) - np.pi / 2)
+    north = np.degrees(2 * np.arctan(np.exp(y + half_y)) - np.pi / 2)
+    return {
+        '_southWest': {'lat': float(south), 'lng': lon - half_lon},
+        '_northEast': {'lat': float(north), 'lng': lon + half_lon},
+    }
+
+def get_grid_cell_size(zoom, cell_pixels=LOD_CELL_PIXELS):
+    """Grid cell edge in degrees that covers about cell_pixels on screen at a zoom level"""
+    return 360 * cell_pixels / (256 * 2 ** zoom)
+
+def aggregate_equipment_grid(data, cell_size):
+    """
+    Aggregate equipment into square lat/lon grid cells
+    Returns one row per non-empty cell with count, max risk and total customers
+    """
+    cells = pd.DataFrame({
+        'row': np.floor(data['latitude'].to_numpy() / cell_size).astype(np.int64),
+        'col': np.floor(data['longitude'].to_numpy() / cell_size).astype(np.int64),
+        'risk_score': data['risk_score'].to_numpy(),
+        'customer_impact': data['customer_impact'].to_numpy(),
+    })
+    grid = cells.groupby(['row', 'col'], sort=False).agg(
+        count=('risk_score', 'size'),
+        max_risk=('risk_score', 'max'),
+        customer_impact=('customer_impact', 'sum'),
+    ).reset_index()
+
+    grid['south'] = grid['row'] * cell_size
+    grid['west'] = grid['col'] * cell_size
+    grid['north'] = grid['south'] + cell_size
+    grid['east'] = grid['west'] + cell_size
+    return grid.drop(columns=['row', 'col'])
+
+def build_grid_geojson(grid):
+    """Build a GeoJSON FeatureCollection of grid cell polygons"""
+    colors = get_risk_colors(grid['max_risk'])
+
+    columns = zip(
+        np.round(grid['south'].to_numpy(), 6).tolist(),
+        np.round(grid['west'].to_numpy(), 6).tolist(),
+        np.round(grid['north'].to_numpy(), 6).tolist(),
+        np.round(grid['east'].to_numpy(), 6).tolist(),
+        grid['count'].to_numpy(dtype=np.int64).tolist(),
+        np.round(grid['max_risk'].to_numpy(dtype=float), 2).tolist(),
+        grid['customer_impact'].to_numpy(dtype=np.int64).tolist(),
+        colors.tolist(),
+    )
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[w, s], [e, s], [e, n], [w, n], [w, s]]],
+            },
+            "properties": {
+                "count": count,
+                "max_risk": max_risk,
+                "customer_impact": customers,
+                "color": color,
+            },
+        }
+        for s, w, n, e, count, max_risk, customers, color in columns
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+def add_level_of_detail_layer(m, data, zoom, bounds=None, center=None):
+    """
+    Add only what the current view needs: equipment outside the bounds is culled,
+    and below LOD_MIN_ZOOM (or past LOD_MAX_POINTS visible assets) the rest is
+    aggregated into grid cells, so the payload stays bounded for any territory
+    Without bounds, e.g. on the first run, the view is derived from center and zoom
+    """
+    if not bounds and center is not None:
+        bounds = get_view_bounds(center, zoom)
+    if bounds:
+        data = data[get_bounds_mask(data, bounds)]
+
+    if zoom < LOD_MIN_ZOOM or len(data) > LOD_MAX_POINTS:
+        grid = aggregate_equipment_grid(data, get_grid_cell_size(zoom))
+        EquipmentGridGeoJson(build_grid_geojson(grid)).add_to(m)
+    else:
+        add_geojson_layer(m, data)
@@ -1,6 +1,8 @@
 import numpy as np
+import pandas as pd
 from datetime import datetime
 from utils.weather_utils import calculate_weather_risk_factor
+from utils.tracing import traced
 
 def calculate_risk_score(equipment, weather_data=None):
     """
@@ -52,6 +54,58 @@ def calculate_risk_score(equipment, weather_data=None):
         print(f"Error calculating risk score: {str(e)}")
         return 0.5  # Default to medium risk on error
 
+@traced()
+def calculate_risk_scores(data, weather_data=None, weather_risk=None):
+    """
+    Vectorized version of calculate_risk_score for a whole DataFrame
+    Returns a float Series aligned with data.index, identical to scoring row by row.
+    weather_risk gives a weather risk factor per asset and takes precedence over weather_data
+    """
+    try:
+        # Weight factors
+        age_weight = 0.25
+        maintenance_weight = 0.20
+        weather_weight = 0.25
+        vegetation_weight = 0.15
+        customer_weight = 0.15
+
+        # Age and maintenance scores (0-1)
+        age_score = np.minimum(data['age'].to_numpy() / 20, 1)
+        maintenance_score = np.minimum(data['days_since_maintenance'].to_numpy() / 365, 1)
+
+        # Weather score (0-1), per asset or a single reading for every asset
+        if weather_risk is not None:
+            weather_score = np.asarray(weather_risk, dtype=float)
+        elif weather_data:
+            weather_score = calculate_weather_risk_factor(weather_data)
+        else:
+            weather_score = np.minimum(
+                (data['temperature'].to_numpy() - 70) ** 2 / 1000 +
+                data['precipitation_forecast'].to_numpy() / 100,
+                1
+            )
+
+        # Vegetation score (0-1)
+        vegetation_score = np.where(data['vegetation_proximity'].to_numpy(dtype=bool), 1, 0)
+
+        # Customer impact score (0-1)
+        customer_score = np.minimum(data['customer_impact'].to_numpy() / 1000, 1)
+
+        # Calculate weighted risk score
+        risk_score = (
+            age_score * age_weight +
+            maintenance_score * maintenance_weight +
+            weather_score * weather_weight +
+            vegetation_score * vegetation_weight +
+            customer_score * customer_weight
+        )
+
+        return pd.Series(np.clip(risk_score, 0, 1), index=data.index, name='risk_score')
+
+    except Exception as e:
+        print(f"Error calculating risk scores: {str(e)}")
+        return pd.Series(0.5, index=data.index, name='risk_score')  # Default to medium risk on error
+
 def get_risk_level(risk_score):
     """Convert risk score to risk level"""
     if risk_score < 0.3:
@@ -61,4 +115,13 @@ def get_risk_level(risk_score):
     elif risk_score < 0.7:
         return "High"
     else:
-        return "Critical"
\ No newline at end of file
+        return "Critical"
+
+def get_risk_levels(risk_scores):
+    """Convert a Series of risk scores to risk levels"""
+    levels = np.select(
+        [risk_scores < 0.3, risk_scores < 0.5, risk_scores < 0.7],
+        ["Low", "Medium", "High"],
+        default="Critical"
+    )
+    return pd.Series(levels, index=risk_scores.index, name='risk_level')
@@ -0,0 +1,236 @@
+import os
+import time
+import hashlib
+import threading
+import numpy as np
+
+from utils.tracing import traced
+
+# Per-snapshot fleet aggregates stored next to the scores: mean, max and the
+# share of assets at High risk or above
+AGGREGATES = ['mean', 'max', 'at_risk_share']
+AT_RISK_THRESHOLD = 0.5
+
+def series_key(asset_ids):
+    """Identity of a fleet layout, new ids or a new order start a new series"""
+    joined = "\0".join(map(str, asset_ids))
+    return hashlib.sha1(joined.encode()).hexdigest()[:16]
+
+def lttb(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a sorted series
+    Keeps the first and last point and, from each of max_points - 2 buckets,
+    the point forming the largest triangle with its neighbours, which keeps
+    the visual shape of the line. Returns the indexes of the kept points
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket stands in for the point chosen there
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous]) -
+            (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return kept
+
+def minmax_buckets(x, y, buckets):
+    """
+    Indexes of the minimum and maximum point in each of buckets equal-width
+    buckets, so spikes survive downsampling. Returns at most 2 * buckets points
+    """
+    n = len(x)
+    if 2 * buckets >= n:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    kept = []
+    for start, stop in zip(edges[:-1], edges[1:]):
+        if stop > start:
+            segment = y[start:stop]
+            kept.extend(sorted({start + int(np.argmin(segment)), start + int(np.argmax(segment))}))
+    return np.array(kept, dtype=np.int64)
+
+def downsample(times, values, max_points=None, method="lttb"):
+    """Apply lttb or minmax downsampling to a (times, values) series"""
+    if max_points is None or len(times) <= max_points:
+        return times, values
+    if method == "minmax":
+        kept = minmax_buckets(times, values, max_points // 2)
+    else:
+        kept = lttb(times, values, max_points)
+    return times[kept], values[kept]
+
+class RiskSeries:
+    """
+    Append-only history of risk scores for one fleet layout
+    Every snapshot appends one row of float16 scores (one per asset) to the
+    current chunk file, its timestamp to a .time file and its fleet aggregates
+    to an .agg file. Chunks roll over after chunk_snapshots rows, and are read
+    through memory maps so a per-asset query only touches one column.
+    float16 keeps about three significant digits, plenty for a 0-1 score.
+    NaN marks an asset not scored in a snapshot, queries leave those out
+    """
+
+    def __init__(self, directory, asset_ids=None, chunk_snapshots=256, min_interval=0):
+        self.directory = directory
+        self.chunk_snapshots = chunk_snapshots
+        self.min_interval = min_interval
+        self.lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+        assets_path = os.path.join(directory, "assets.npy")
+        if asset_ids is not None and not os.path.exists(assets_path):
+            tmp_path = f"{assets_path}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, np.asarray(asset_ids, dtype=str))
+            os.replace(tmp_path, assets_path)
+        self.asset_ids = np.load(assets_path)
+        self.size = len(self.asset_ids)
+        self._positions = None
+
+    def position(self, asset_id):
+        """Column of asset_id in this series, or None"""
+        if self._positions is None:
+            self._positions = {asset_id: position for position, asset_id in enumerate(self.asset_ids.tolist())}
+        return self._positions.get(str(asset_id))
+
+    def _chunks(self):
+        """Sorted chunk numbers on disk"""
+        return sorted(
+            int(name[len("chunk-"):-len(".time")]) for name in os.listdir(self.directory)
+            if name.startswith("chunk-") and name.endswith(".time")
+        )
+
+    def _path(self, chunk, kind):
+        return os.path.join(self.directory, f"chunk-{chunk:06d}.{kind}")
+
+    def _chunk_times(self, chunk):
+        return np.fromfile(self._path(chunk, "time"), dtype=np.float64)
+
+    def append(self, timestamp, risk_scores):
+        """
+        Record the risk score of every asset at timestamp (seconds since the
+        epoch), NaN for assets that were not scored. Aggregates cover the scored
+        assets and are NaN when there are none
+        """
+        scores = np.asarray(risk_scores, dtype=np.float16)
+        if len(scores) != self.size:
+            raise ValueError(f"Expected {self.size} risk scores, got {len(scores)}")
+        scored = scores[~np.isnan(scores)]
+        aggregates = np.array([
+            scored.mean(dtype=np.float64) if len(scored) else np.nan,
+            scored.max() if len(scored) else np.nan,
+            (scored >= AT_RISK_THRESHOLD).mean() if len(scored) else np.nan,
+        ], dtype=np.float32)
+
+        with self.lock:
+            chunks = self._chunks()
+            chunk = chunks[-1] if chunks else 0
+            # A chunk holds as many snapshots as it has timestamps
+            if chunks and os.path.getsize(self._path(chunk, "time")) // 8 >= self.chunk_snapshots:
+                chunk += 1
+            # Scores and aggregates first, so a row is only visible once its timestamp lands
+            with open(self._path(chunk, "risk"), "ab") as f:
+                f.write(scores.tobytes())
+            with open(self._path(chunk, "agg"), "ab") as f:
+                f.write(aggregates.tobytes())
+            with open(self._path(chunk, "time"), "ab") as f:
+                f.write(np.float64(timestamp).tobytes())
+
+    @traced()
+    def record(self, risk_scores, timestamp=None):
+        """
+        Append one scoring cycle unless the last one is less than min_interval
+        seconds old, so reruns and restarts do not duplicate it. The check and
+        the append hold the lock together, so sessions recording at the same
+        moment write the cycle once. Returns whether the snapshot was written
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            last = self.last_timestamp()
+            if last is not None and timestamp - last < self.min_interval:
+                return False
+            self.append(timestamp, risk_scores)
+        return True
+
+    def last_timestamp(self):
+        chunks = self._chunks()
+        if not chunks:
+            return None
+        times = self._chunk_times(chunks[-1])
+        return float(times[-1]) if len(times) else None
+
+    def _query(self, start, end, read):
+        """Concatenate read(chunk, rows) over the snapshots between start and end"""
+        times, values = [], []
+        for chunk in self._chunks():
+            chunk_times = self._chunk_times(chunk)
+            lo = 0 if start is None else int(np.searchsorted(chunk_times, start, side='left'))
+            hi = len(chunk_times) if end is None else int(np.searchsorted(chunk_times, end, side='right'))
+            if hi > lo:
+                times.append(chunk_times[lo:hi])
+                values.append(read(chunk, len(chunk_times), slice(lo, hi)))
+        if not times:
+            return np.empty(0), np.empty(0, dtype=np.float32)
+        times, values = np.concatenate(times), np.concatenate(values)
+        scored = ~np.isnan(values)
+        return times[scored], values[scored]
+
+    @traced()
+    def asset_history(self, position, start=None, end=None, max_points=None, method="lttb"):
+        """(timestamps, risk scores) of the asset at position between start and end, downsampled to max_points"""
+        def read(chunk, rows, selected):
+            scores = np.memmap(self._path(chunk, "risk"), dtype=np.float16, mode='r', shape=(rows, self.size))
+            return scores[selected, position].astype(np.float32)
+
+        times, values = self._query(start, end, read)
+        return downsample(times, values, max_points, method)
+
+    @traced()
+    def fleet_history(self, aggregate="mean", start=None, end=None, max_points=None, method="lttb"):
+        """(timestamps, values) of a fleet aggregate, read from the stored aggregates"""
+        column = AGGREGATES.index(aggregate)
+
+        def read(chunk, rows, selected):
+            aggregates = np.fromfile(self._path(chunk, "agg"), dtype=np.float32).reshape(-1, len(AGGREGATES))
+            return aggregates[:rows][selected, column]
+
+        times, values = self._query(start, end, read)
+        return downsample(times, values, max_points, method)
+
+class RiskHistory:
+    """
+    Risk history of every fleet layout under one directory, one RiskSeries
+    per layout, so a registry reload that adds or reorders assets starts a
+    new series instead of misaligning the old one
+    """
+
+    def __init__(self, directory, min_interval=300, chunk_snapshots=256):
+        self.directory = directory
+        self.min_interval = min_interval
+        self.chunk_snapshots = chunk_snapshots
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def get_series(self, asset_ids):
+        key = series_key(asset_ids)
+        with self.lock:
+            if key not in self.series:
+                self.series[key] = RiskSeries(
+                    os.path.join(self.directory, key), asset_ids,
+                    chunk_snapshots=self.chunk_snapshots, min_interval=self.min_interval
+                )
+            return self.series[key]
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from utils.weather_utils import calculate_weather_risk_factor
+from utils.tracing import traced
+
+# Per-asset features, each scaled 0-1 as in calculate_risk_score
+FEATURES = ['age', 'maintenance', 'vegetation', 'customer', 'temperature', 'precipitation']
+
+# Weights of the features that do not depend on the weather, and of the weather term
+STATIC_WEIGHTS = {'age': 0.25, 'maintenance': 0.20, 'vegetation': 0.15, 'customer': 0.15}
+WEATHER_WEIGHT = 0.25
+
+# What-if forecasts for storm preparation. 'weather' is scored like a NOAA
+# reading by calculate_weather_risk_factor, 'exposure' adds weather risk per
+# unit of an asset feature, e.g. wind hits equipment near vegetation hardest
+DEFAULT_SCENARIOS = [
+    {'name': "Mild", 'weather': {'temperature': 70, 'forecast': "Sunny"}},
+    {'name': "Overcast", 'weather': {'temperature': 62, 'forecast': "Mostly Cloudy"}},
+    {'name': "Heat wave", 'weather': {'temperature': 105, 'forecast': "Hot and Sunny"},
+     'exposure': {'age': 0.3, 'temperature': 0.3}},
+    {'name': "Cold snap", 'weather': {'temperature': 25, 'forecast': "Snow"},
+     'exposure': {'age': 0.2}},
+    {'name': "Atmospheric river", 'weather': {'temperature': 58, 'forecast': "Heavy Rain"},
+     'exposure': {'precipitation': 0.5, 'maintenance': 0.2}},
+    {'name': "Wind event", 'weather': {'temperature': 65, 'forecast': "Windy"},
+     'exposure': {'vegetation': 0.6, 'age': 0.2}},
+    {'name': "Thunderstorm", 'weather': {'temperature': 80, 'forecast': "Thunderstorms"},
+     'exposure': {'vegetation': 0.3}},
+]
+
+def scenario_coefficients(scenarios):
+    """
+    Weather term of every scenario as a base risk and one exposure coefficient
+    per feature: weather risk = clip(base + exposure @ features, 0, 1)
+    """
+    base = np.array([calculate_weather_risk_factor(scenario['weather']) for scenario in scenarios], dtype=float)
+    exposure = np.zeros((len(scenarios), len(FEATURES)))
+    for row, scenario in enumerate(scenarios):
+        for feature, coefficient in scenario.get('exposure', {}).items():
+            exposure[row, FEATURES.index(feature)] = coefficient
+    return base, exposure
+
+class ScenarioEngine:
+    """
+    Scores one version of the fleet against many weather scenarios at once
+    The per-asset feature matrix and the weather-independent part of the risk
+    score are computed once. Each batch of scenarios is then a single matrix
+    product, giving an S x N risk matrix that matches calculate_risk_scores
+    (up to float rounding) for scenarios without exposure
+    """
+
+    def __init__(self, data):
+        self.size = len(data)
+        self.customers = data['customer_impact'].to_numpy(dtype=float)
+        self.features = np.column_stack([
+            np.minimum(data['age'].to_numpy(dtype=float) / 20, 1),
+            np.minimum(data['days_since_maintenance'].to_numpy(dtype=float) / 365, 1),
+            data['vegetation_proximity'].to_numpy(dtype=bool).astype(float),
+            np.minimum(self.customers / 1000, 1),
+            np.minimum((data['temperature'].to_numpy(dtype=float) - 70) ** 2 / 1000, 1),
+            np.minimum(data['precipitation_forecast'].to_numpy(dtype=float) / 100, 1),
+        ])
+        weights = np.array([STATIC_WEIGHTS.get(feature, 0.0) for feature in FEATURES])
+        self.static_risk = self.features @ weights
+
+    def risk_matrix(self, scenarios, start=0, stop=None):
+        """Risk score of assets start:stop under every scenario, an S x N array"""
+        base, exposure = scenario_coefficients(scenarios)
+        features = self.features[start:stop]
+        weather_risk = np.clip(base[:, None] + exposure @ features.T, 0, 1)
+        return np.clip(self.static_risk[start:stop] + WEATHER_WEIGHT * weather_risk, 0, 1)
+
+    @traced()
+    def evaluate(self, scenarios, k=10, threshold=0.5, chunk_size=100_000):
+        """
+        Summary of every scenario: mean risk, assets and customers at or above
+        threshold, and the positions of the k riskiest assets, highest first.
+        Assets are processed chunk_size at a time so memory stays S x chunk_size
+        """
+        n_scenarios = len(scenarios)
+        risk_sum = np.zeros(n_scenarios)
+        at_risk_assets = np.zeros(n_scenarios, dtype=np.int64)
+        at_risk_customers = np.zeros(n_scenarios)
+        top_positions = np.empty((n_scenarios, 0), dtype=np.int64)
+        top_risk = np.empty((n_scenarios, 0))
+
+        for start in range(0, self.size, chunk_size):
+            risk = self.risk_matrix(scenarios, start, start + chunk_size)
+            at_risk = risk >= threshold
+            risk_sum += risk.sum(axis=1)
+            at_risk_assets += at_risk.sum(axis=1)
+            at_risk_customers += at_risk @ self.customers[start:start + chunk_size]
+
+            # Keep the running top k of each scenario
+            candidates = np.hstack([top_risk, risk])
+            positions = np.hstack([top_positions, np.broadcast_to(
+                np.arange(start, start + risk.shape[1]), risk.shape
+            )])
+            if candidates.shape[1] > k:
+                keep = np.argpartition(-candidates, k - 1, axis=1)[:, :k]
+                candidates = np.take_along_axis(candidates, keep, axis=1)
+                positions = np.take_along_axis(positions, keep, axis=1)
+            top_risk, top_positions = candidates, positions
+
+        order = np.argsort(-top_risk, axis=1, kind='stable')
+        top_positions = np.take_along_axis(top_positions, order, axis=1)
+        top_risk = np.take_along_axis(top_risk, order, axis=1)
+
+        return pd.DataFrame({
+            'scenario': [scenario['name'] for scenario in scenarios],
+            'mean_risk': risk_sum / max(self.size, 1),
+            'at_risk_assets': at_risk_assets,
+            'at_risk_customers': at_risk_customers.astype(np.int64),
+            'top_positions': list(top_positions),
+            'top_risk': list(top_risk),
+        })
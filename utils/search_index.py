@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+
+from utils.tracing import traced
+
+GRAM_SIZE = 3
+
+def _gram_codes(codepoints, lengths):
+    """
+    Encode every character trigram of a (terms x width) codepoint matrix as one
+    int64 (three 21-bit codepoints). Returns (codes, term ids) pairs
+    """
+    codes, term_ids = [], []
+    for start in range(codepoints.shape[1] - GRAM_SIZE + 1):
+        valid = np.flatnonzero(lengths >= start + GRAM_SIZE)
+        if len(valid) == 0:
+            break
+        window = codepoints[valid, start:start + GRAM_SIZE].astype(np.int64)
+        codes.append((window[:, 0] << 42) | (window[:, 1] << 21) | window[:, 2])
+        term_ids.append(valid)
+    if not codes:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(codes), np.concatenate(term_ids)
+
+def _term_gram_codes(term):
+    """Trigram codes of a single lowercased term"""
+    return {
+        (ord(term[i]) << 42) | (ord(term[i + 1]) << 21) | ord(term[i + 2])
+        for i in range(len(term) - GRAM_SIZE + 1)
+    }
+
+def _csr(keys, values):
+    """Group values by key into (sorted unique keys, offsets, values sorted by key)"""
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    unique_keys, starts = np.unique(keys, return_index=True)
+    offsets = np.append(starts, len(keys))
+    return unique_keys, offsets, values
+
+class SearchIndex:
+    """
+    Case-insensitive substring search over equipment fields
+    Every distinct field value is lowercased once and stored as a term. Terms are
+    indexed by their character trigrams, and each term maps to the row positions
+    holding it, so a query only verifies the terms that contain all of its
+    trigrams. Rows can be added or changed incrementally with update()
+    """
+
+    def __init__(self, data, fields=('product_id', 'product_name')):
+        self.fields = list(fields)
+
+        # Distinct lowercased values of all fields form one sorted term array
+        field_codes, field_terms = [], []
+        for field in self.fields:
+            codes, uniques = pd.factorize(data[field], use_na_sentinel=False)
+            field_codes.append(codes)
+            field_terms.append(pd.Index(uniques).astype(str).str.lower().to_numpy(dtype=str))
+        self.terms, inverse = np.unique(np.concatenate(field_terms), return_inverse=True)
+
+        # Current term of every row in every field, one column per field
+        self.position_terms = np.empty((len(data), len(self.fields)), dtype=np.int64)
+        offset = 0
+        for column, (codes, terms) in enumerate(zip(field_codes, field_terms)):
+            self.position_terms[:, column] = inverse[offset:offset + len(terms)][codes]
+            offset += len(terms)
+
+        # Trigram -> term ids
+        lengths = np.char.str_len(self.terms)
+        codepoints = self.terms.view(np.uint32).reshape(len(self.terms), -1) if len(self.terms) else np.empty((0, 0), np.uint32)
+        gram_codes, gram_terms = _gram_codes(codepoints, lengths)
+        self.gram_keys, self.gram_offsets, self.gram_terms = _csr(gram_codes, gram_terms)
+
+        # Term id -> row positions
+        positions = np.repeat(np.arange(len(data)), len(self.fields))
+        self.term_keys, self.term_offsets, self.term_positions = _csr(self.position_terms.ravel(), positions)
+
+        # Terms and postings added by update() since the index was built
+        self.added_terms = []
+        self.added_term_ids = {}
+        self.added_grams = {}
+        self.added_positions = {}
+
+    def __len__(self):
+        return len(self.position_terms)
+
+    def _term(self, term_id):
+        if term_id < len(self.terms):
+            return str(self.terms[term_id])
+        return self.added_terms[term_id - len(self.terms)]
+
+    def _term_id(self, term, create=False):
+        """Id of a lowercased term, optionally registering it if unknown"""
+        found = int(np.searchsorted(self.terms, term))
+        if found < len(self.terms) and self.terms[found] == term:
+            return found
+        if term in self.added_term_ids:
+            return self.added_term_ids[term]
+        if not create:
+            return None
+
+        term_id = len(self.terms) + len(self.added_terms)
+        self.added_terms.append(term)
+        self.added_term_ids[term] = term_id
+        for code in _term_gram_codes(term):
+            self.added_grams.setdefault(code, set()).add(term_id)
+        return term_id
+
+    def _gram_term_ids(self, code):
+        found = int(np.searchsorted(self.gram_keys, code))
+        base = np.empty(0, dtype=np.int64)
+        if found < len(self.gram_keys) and self.gram_keys[found] == code:
+            base = self.gram_terms[self.gram_offsets[found]:self.gram_offsets[found + 1]]
+        added = self.added_grams.get(code)
+        if added:
+            return np.union1d(base, np.fromiter(added, dtype=np.int64))
+        return base
+
+    def _matching_terms(self, query):
+        """Ids of all terms containing the lowercased query"""
+        if len(query) < GRAM_SIZE:
+            # Too short to use trigrams, scan every term
+            matches = np.flatnonzero(np.char.find(self.terms, query) >= 0).tolist()
+            return matches + [
+                term_id for term, term_id in self.added_term_ids.items() if query in term
+            ]
+
+        candidates = None
+        for code in sorted(_term_gram_codes(query)):
+            term_ids = self._gram_term_ids(code)
+            candidates = term_ids if candidates is None else np.intersect1d(candidates, term_ids, assume_unique=True)
+            if len(candidates) == 0:
+                return []
+        return [int(term_id) for term_id in candidates if query in self._term(int(term_id))]
+
+    def _term_rows(self, term_ids):
+        """Row positions posted under any of the term ids, possibly stale"""
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        found = np.searchsorted(self.term_keys, term_ids)
+        found = found[found < len(self.term_keys)]
+        found = found[np.isin(self.term_keys[found], term_ids)]
+
+        # Concatenate the CSR slices of all matched terms without a Python loop
+        starts = self.term_offsets[found]
+        lengths = self.term_offsets[found + 1] - starts
+        slice_starts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        rows = [self.term_positions[slice_starts + np.arange(lengths.sum())]]
+
+        if self.added_positions:
+            wanted = set(term_ids.tolist())
+            rows.extend(
+                np.fromiter(positions, dtype=np.int64)
+                for term_id, positions in self.added_positions.items() if term_id in wanted
+            )
+        return np.concatenate(rows)
+
+    @traced()
+    def search(self, query):
+        """
+        Sorted row positions whose fields contain query (case-insensitive)
+        An empty query returns None, meaning every row matches
+        """
+        query = query.strip().lower()
+        if not query:
+            return None
+
+        term_ids = self._matching_terms(query)
+        if not term_ids:
+            return np.empty(0, dtype=np.int64)
+
+        rows = np.unique(self._term_rows(term_ids))
+        # Postings are never rewritten, drop rows whose term has since changed
+        current = np.isin(self.position_terms[rows], term_ids).any(axis=1)
+        return rows[current]
+
+    def update(self, position, values):
+        """
+        Add or change the row at position, values maps field name to its new value
+        Positions past the end extend the index
+        """
+        if position >= len(self.position_terms):
+            grown = np.full((position + 1, len(self.fields)), -1, dtype=np.int64)
+            grown[:len(self.position_terms)] = self.position_terms
+            self.position_terms = grown
+
+        for column, field in enumerate(self.fields):
+            if field not in values:
+                continue
+            term_id = self._term_id(str(values[field]).lower(), create=True)
+            if self.position_terms[position, column] != term_id:
+                self.position_terms[position, column] = term_id
+                self.added_positions.setdefault(term_id, set()).add(position)
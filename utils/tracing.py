@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import logging
+import functools
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger("powerai.trace")
+
+# POWERAI_TRACE_LOG=1 logs every traced script run as one JSON line
+LOG_TRACES = os.environ.get("POWERAI_TRACE_LOG", "").lower() in ("1", "true", "yes")
+
+# Trace collecting spans in the current context, None when tracing is off
+_current_trace = contextvars.ContextVar("powerai_trace", default=None)
+
+class Span:
+    """One timed stage, with attributes such as row counts and payload sizes"""
+
+    __slots__ = ("name", "depth", "start", "duration", "attrs")
+
+    def __init__(self, name, depth, start, attrs):
+        self.name = name
+        self.depth = depth
+        self.start = start
+        self.duration = None
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'depth': self.depth,
+            'start_ms': round(self.start * 1000, 3),
+            'duration_ms': None if self.duration is None else round(self.duration * 1000, 3),
+            **self.attrs,
+        }
+
+class Trace:
+    """Spans of one script run (or any other unit of work), in start order"""
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.stack = []
+        self.duration = None
+
+    def to_dict(self):
+        return {
+            'trace': self.name,
+            'started_at': self.started_at,
+            'duration_ms': None if self.duration is None else round(self.duration * 1000, 3),
+            **self.attrs,
+            'spans': [span.to_dict() for span in self.spans],
+        }
+
+def start_trace(name, enabled=False, **attrs):
+    """
+    Start collecting spans in the current context and return the Trace, or None
+    if neither enabled nor POWERAI_TRACE_LOG is set. Untraced spans cost one
+    context variable lookup
+    """
+    if not (enabled or LOG_TRACES):
+        _current_trace.set(None)
+        return None
+    trace = Trace(name, **attrs)
+    _current_trace.set(trace)
+    return trace
+
+def finish_trace(trace):
+    """Stop collecting spans and log the trace as JSON when logging is enabled"""
+    if trace is None:
+        return None
+    trace.duration = time.perf_counter() - trace.origin
+    _current_trace.set(None)
+    if LOG_TRACES:
+        logger.info(json.dumps(trace.to_dict(), default=str))
+    return trace
+
+class _NoSpan:
+    """Stand-in yielded when tracing is off, so callers can always call set()"""
+
+    def set(self, **attrs):
+        pass
+
+_NO_SPAN = _NoSpan()
+
+@contextmanager
+def span(name, **attrs):
+    """Time the enclosed block as a span of the current trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield _NO_SPAN
+        return
+
+    current = Span(name, len(trace.stack), time.perf_counter() - trace.origin, attrs)
+    trace.spans.append(current)
+    trace.stack.append(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - trace.origin - current.start
+        trace.stack.pop()
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span, if any"""
+    trace = _current_trace.get()
+    if trace is not None and trace.stack:
+        trace.stack[-1].set(**attrs)
+
+def _size(value):
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+def traced(name=None):
+    """
+    Decorator timing every call as a span named after the function. The span
+    records the length of the first argument as rows and of a sized result
+    as result_rows
+    """
+    def decorate(func):
+        span_name = name or func.__qualname__
+        is_method = '.' in func.__qualname__.replace('<locals>.', '')
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+
+            # Methods are sized by their first real argument, not self
+            sized = args[1:] if is_method else args
+            attrs = {}
+            if sized and not isinstance(sized[0], str):
+                rows = _size(sized[0])
+                if rows is not None:
+                    attrs['rows'] = rows
+            with span(span_name, **attrs) as current:
+                result = func(*args, **kwargs)
+                if result is not None and not isinstance(result, (str, dict, tuple)):
+                    result_rows = _size(result)
+                    if result_rows is not None:
+                        current.set(result_rows=result_rows)
+                return result
+        return wrapper
+    return decorate
+
+def configure_logging(level=logging.INFO):
+    """Send trace JSON lines to stderr, once per process"""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
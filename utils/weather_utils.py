@@ -1,48 +1,311 @@
+import time
+import threading
 import requests
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
 
-def fetch_noaa_weather(latitude, longitude):
+from utils.json_store import JsonFileStore
+from utils.tracing import traced
+
+NOAA_API_URL = "https://api.weather.gov"
+
+# NOAA forecast grids are 2.5 km, assets are bucketed into cells of about that size
+WEATHER_CELL_SIZE = 0.025
+
+# (connect, read) timeouts in seconds for every NOAA request
+NOAA_TIMEOUT = (3.05, 10)
+
+# Default values used when the API fails
+DEFAULT_WEATHER = {
+    'temperature': 58,
+    'temperature_unit': 'F',
+    'forecast': 'mostly sunny',
+    'wind_speed': '5 mph',
+    'wind_direction': 'N',
+    'is_daytime': True
+}
+
+def create_weather_session(retries=3, backoff_factor=0.5, pool_size=10):
+    """
+    Pooled HTTP session for NOAA requests
+    Connection errors and 429/5xx responses are retried with exponential backoff
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.headers['User-Agent'] = "Power.AI grid dashboard"
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def request_noaa_weather(latitude, longitude, base_url=NOAA_API_URL, session=None, timeout=NOAA_TIMEOUT):
+    """
+    Fetch the current forecast period from the NOAA API, raising on failure
+    """
+    http = session or requests
+
+    # NOAA Weather API endpoint for points
+    points_url = f"{base_url}/points/{latitude},{longitude}"
+    
+    # Get the forecast URL from points response
+    response = http.get(points_url, timeout=timeout)
+    response.raise_for_status()
+    forecast_url = response.json()['properties']['forecast']
+    
+    # Get the actual forecast
+    forecast_response = http.get(forecast_url, timeout=timeout)
+    forecast_response.raise_for_status()
+    forecast_data = forecast_response.json()
+    
+    # Get current period's forecast
+    current_weather = forecast_data['properties']['periods'][0]
+    
+    return {
+        'temperature': current_weather['temperature'],
+        'temperature_unit': current_weather['temperatureUnit'],
+        'forecast': current_weather['shortForecast'],
+        'wind_speed': current_weather['windSpeed'],
+        'wind_direction': current_weather['windDirection'],
+        'is_daytime': current_weather['isDaytime']
+    }
+
+def fetch_noaa_weather(latitude, longitude, base_url=NOAA_API_URL, session=None, timeout=NOAA_TIMEOUT):
     """
     Fetch weather data from NOAA API for given coordinates
     """
     try:
-        # NOAA Weather API endpoint for points
-        points_url = f"https://api.weather.gov/points/{latitude},{longitude}"
-        
-        # Get the forecast URL from points response
-        response = requests.get(points_url)
-        response.raise_for_status()
-        forecast_url = response.json()['properties']['forecast']
-        
-        # Get the actual forecast
-        forecast_response = requests.get(forecast_url)
-        forecast_response.raise_for_status()
-        forecast_data = forecast_response.json()
-        
-        # Get current period's forecast
-        current_weather = forecast_data['properties']['periods'][0]
-        
-        return {
-            'temperature': current_weather['temperature'],
-            'temperature_unit': current_weather['temperatureUnit'],
-            'forecast': current_weather['shortForecast'],
-            'wind_speed': current_weather['windSpeed'],
-            'wind_direction': current_weather['windDirection'],
-            'is_daytime': current_weather['isDaytime']
-        }
+        return request_noaa_weather(latitude, longitude, base_url, session, timeout)
         
     except Exception as e:
         print(f"Error fetching weather data: {str(e)}")
         # Return default values if API fails
-        return {
-            'temperature': 58,
-            'temperature_unit': 'F',
-            'forecast': 'mostly sunny',
-            'wind_speed': '5 mph',
-            'wind_direction': 'N',
-            'is_daytime': True
-        }
+        return dict(DEFAULT_WEATHER)
+
+class WeatherCache:
+    """
+    Weather readings keyed by location with TTL eviction
+    Entries are kept in memory and, with cache_dir, as one JSON file per key so
+    readings survive restarts and are shared by processes on the same host.
+    Entries are fresh for their ttl, then stay available through get_entry for
+    another stale_ttl seconds so they can be served while being revalidated.
+    Keys found missing on disk are remembered for negative_ttl seconds, so a
+    cell that was never fetched is not looked up on disk on every call
+    """
+
+    def __init__(self, ttl=1800, cache_dir=None, stale_ttl=0, negative_ttl=60):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.cache_dir = cache_dir
+        self.store = JsonFileStore(cache_dir) if cache_dir else None
+        self.entries = {}
+        self.missing = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Cached reading for key, or None if missing or expired"""
+        entry = self.get_entry(key)
+        if entry is None or time.time() - entry['fetched_at'] > entry['ttl']:
+            return None
+        return entry['weather']
+
+    def get_entry(self, key):
+        """
+        Cache entry for key with its fetched_at time and ttl, including stale
+        entries, or None once it is past the stale window
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            # Another process may write the file, so misses are only trusted for a while
+            known_missing = time.time() < self.missing.get(key, 0)
+        if entry is None and self.store and not known_missing:
+            entry = self.store.read(key)
+            with self.lock:
+                if entry is None:
+                    self.missing[key] = time.time() + self.negative_ttl
+                    return None
+                self.entries[key] = entry
+        if entry is None:
+            return None
+        if time.time() - entry['fetched_at'] > entry['ttl'] + self.stale_ttl:
+            self.delete(key)
+            return None
+        return entry
+
+    def set(self, key, weather, ttl=None):
+        entry = {'fetched_at': time.time(), 'ttl': ttl if ttl is not None else self.ttl, 'weather': weather}
+        with self.lock:
+            self.entries[key] = entry
+            self.missing.pop(key, None)
+        if self.store:
+            self.store.write(key, entry)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.missing[key] = time.time() + self.negative_ttl
+        if self.store:
+            self.store.delete(key)
+
+    def evict_expired(self):
+        """Drop every expired entry from memory and disk"""
+        now = time.time()
+        with self.lock:
+            expired = [
+                key for key, entry in self.entries.items()
+                if now - entry['fetched_at'] > entry['ttl'] + self.stale_ttl
+            ]
+        for key in expired:
+            self.delete(key)
+        if self.store:
+            for key in self.store.keys():
+                if key not in self.entries:
+                    with self.lock:
+                        self.missing.pop(key, None)
+                    self.get_entry(key)  # Loads and evicts if expired
+
+def weather_cell_key(latitude, longitude):
+    return f"{latitude:.4f}_{longitude:.4f}"
+
+@traced()
+def get_weather_cells(latitude, longitude, cell_size=WEATHER_CELL_SIZE):
+    """
+    Bucket asset coordinates into weather grid cells
+    Returns (cell center latitudes, cell center longitudes, cell of every asset)
+    """
+    # Pack (row, col) into one int64 so cells can be found with a 1-D unique
+    offset, span = 1 << 20, 1 << 21
+    rows = np.floor(np.asarray(latitude, dtype=float) / cell_size).astype(np.int64) + offset
+    cols = np.floor(np.asarray(longitude, dtype=float) / cell_size).astype(np.int64) + offset
+    cells, asset_cells = np.unique(rows * span + cols, return_inverse=True)
+    center_lats = (cells // span - offset + 0.5) * cell_size
+    center_lons = (cells % span - offset + 0.5) * cell_size
+    return center_lats, center_lons, asset_cells.ravel()
+
+@traced()
+def fetch_cell_weather(center_lats, center_lons, cache, base_url=NOAA_API_URL,
+                       max_workers=8, failure_ttl=300, session=None, timeout=NOAA_TIMEOUT):
+    """
+    Weather reading for every cell center, fetching only cells missing from cache
+    Failed cells get DEFAULT_WEATHER, cached for failure_ttl seconds so an
+    unreachable API is not retried on every call
+    """
+    keys = [weather_cell_key(lat, lon) for lat, lon in zip(center_lats, center_lons)]
+    readings = [cache.get(key) for key in keys]
+    missing = [i for i, reading in enumerate(readings) if reading is None]
+
+    def fetch(i):
+        try:
+            weather = request_noaa_weather(
+                round(float(center_lats[i]), 4), round(float(center_lons[i]), 4), base_url, session, timeout
+            )
+            cache.set(keys[i], weather)
+        except Exception as e:
+            print(f"Error fetching weather data for cell {keys[i]}: {str(e)}")
+            weather = dict(DEFAULT_WEATHER)
+            cache.set(keys[i], weather, ttl=failure_ttl)
+        return weather
+
+    if missing:
+        session = session or create_weather_session(pool_size=max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for i, weather in zip(missing, pool.map(fetch, missing)):
+                readings[i] = weather
+    return readings
+
+def calculate_cell_weather_risk(readings):
+    """Weather risk factor of every cell reading as an array"""
+    return np.array([calculate_weather_risk_factor(weather) for weather in readings], dtype=float)
+
+class WeatherRefresher:
+    """
+    Stale-while-revalidate weather for grid cells, shared by all sessions
+    get_readings never waits on the network: it returns what the cache holds
+    (DEFAULT_WEATHER for cells never fetched) and refreshes missing or stale
+    cells on a background thread pool through one pooled, retrying session.
+    Every evict_interval seconds the pool also evicts expired cells, so cells
+    nobody reads again do not stay in the cache directory
+    """
+
+    def __init__(self, cache, base_url=NOAA_API_URL, max_workers=4, failure_ttl=300, evict_interval=3600):
+        self.cache = cache
+        self.base_url = base_url
+        self.failure_ttl = failure_ttl
+        self.evict_interval = evict_interval
+        self.evicted_at = time.time()
+        self.session = create_weather_session(pool_size=max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="weather-refresh")
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.retry_after = {}
+        # Incremented whenever a refresh lands, so callers can tell new data arrived
+        self.version = 0
+
+    @traced()
+    def get_readings(self, center_lats, center_lons):
+        """
+        Cached reading of every cell and its age in seconds (None if never fetched),
+        scheduling a background refresh for every missing or stale cell
+        """
+        now = time.time()
+        readings, ages = [], []
+        for lat, lon in zip(center_lats, center_lons):
+            key = weather_cell_key(lat, lon)
+            entry = self.cache.get_entry(key)
+            if entry is None:
+                readings.append(dict(DEFAULT_WEATHER))
+                ages.append(None)
+            else:
+                readings.append(entry['weather'])
+                ages.append(now - entry['fetched_at'])
+            if entry is None or now - entry['fetched_at'] > entry['ttl']:
+                self._schedule(key, lat, lon, now)
+        self._schedule_eviction(now)
+        return readings, ages
+
+    def _schedule_eviction(self, now):
+        with self.lock:
+            if now - self.evicted_at < self.evict_interval:
+                return
+            self.evicted_at = now
+        self.executor.submit(self._evict)
+
+    def _evict(self):
+        try:
+            self.cache.evict_expired()
+        except Exception as e:
+            print(f"Error evicting expired weather data: {str(e)}")
+
+    def _schedule(self, key, latitude, longitude, now):
+        with self.lock:
+            if key in self.pending or self.retry_after.get(key, 0) > now:
+                return
+            self.pending.add(key)
+        self.executor.submit(self._refresh, key, round(float(latitude), 4), round(float(longitude), 4))
+
+    def _refresh(self, key, latitude, longitude):
+        try:
+            self.cache.set(key, request_noaa_weather(latitude, longitude, self.base_url, self.session))
+            with self.lock:
+                self.retry_after.pop(key, None)
+                self.version += 1
+        except Exception as e:
+            print(f"Error refreshing weather data for cell {key}: {str(e)}")
+            # Keep serving the stale reading and back off before trying again
+            with self.lock:
+                self.retry_after[key] = time.time() + self.failure_ttl
+        finally:
+            with self.lock:
+                self.pending.discard(key)
 
 def calculate_weather_risk_factor(weather_data):
     """